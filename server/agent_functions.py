@@ -1,124 +1,307 @@
 # agent_functions.py - IMPROVED with validation
-from typing import Any, Dict
+import asyncio
+import logging
+import re
+import string
+from functools import lru_cache
+from typing import Any, Callable, Dict, Final, Optional
 from session import (
     get_or_create_session, 
     IssueCategory, 
     Environment, 
     ImpactLevel,
     ValidationError,
-    SUPPORTED_SOFTWARE
+    SUPPORTED_SOFTWARE,
+    SupportSession,
+    REQUIRED_FIELD_BITS,
+    ALL_REQUIRED_MASK,
 )
 from ticket import create_ticket_from_session
 
+try:
+    import ahocorasick
+except ImportError:
+    logging.warning("pyahocorasick not installed. Install with: pip install pyahocorasick")
+    ahocorasick = None
+
 # Category detection from keywords (used for silent classification)
 # More comprehensive and dynamic keyword patterns for engineering/PLM software support
-CATEGORY_KEYWORDS = {
-    IssueCategory.LOGIN_ACCESS: [
+# Compiled into the matchers below at import, so the table is immutable
+CATEGORY_KEYWORDS: Final[dict[IssueCategory, tuple[str, ...]]] = {
+    IssueCategory.LOGIN_ACCESS: (
         "login", "access", "password", "authenticate", "credential", "sign in", "sign-in",
         "unable to log", "cannot log", "login failed", "access denied", "unauthorized",
         "authentication", "session expired", "connection refused", "permission denied",
         "cannot connect", "connection timeout", "unreachable", "offline"
-    ],
-    IssueCategory.LICENSE: [
+    ),
+    IssueCategory.LICENSE: (
         "license", "licence", "subscription", "expired", "renewal", "license key",
         "finding license", "error finding", "license expired", "license invalid",
         "license server", "license checkout", "license unavailable", "license limit",
         "license exceeded", "concurrent users", "seat", "checkout", "license manager",
         "no license available", "license not found"
-    ],
-    IssueCategory.INSTALLATION: [
+    ),
+    IssueCategory.INSTALLATION: (
         "install", "setup", "deploy", "configuration", "uninstall", "reinstall",
         "installer", "installation failed", "setup failed", "cannot install",
         "dependency", "missing file", "corrupt", "installation error", "setup error",
         "upgrade", "patch", "update failed", "installation path", "system requirement",
         "compatibility", "version mismatch"
-    ],
-    IssueCategory.UPLOAD_SAVE: [
+    ),
+    IssueCategory.UPLOAD_SAVE: (
         "upload", "save", "download", "export", "import", "saving",
         "cannot save", "save failed", "upload failed", "download failed",
         "attachment", "file transfer", "disk space", "permission", "write error",
         "file locked", "file in use", "disk full", "storage", "backup",
         "export error", "import error", "file format", "conversion"
-    ],
-    IssueCategory.WORKFLOW: [
+    ),
+    IssueCategory.WORKFLOW: (
         "workflow", "process", "step", "approval", "automation", "task",
         "workflow failed", "process stuck", "approval pending", "notification",
         "status update", "workflow error", "process error", "automation rule",
         "action item", "routing", "escalation", "lifecycle", "state transition",
         "workflow engine", "business rule"
-    ],
-    IssueCategory.PERFORMANCE: [
+    ),
+    IssueCategory.PERFORMANCE: (
         "slow", "lag", "speed", "performance", "timeout", "sluggish", "hanging",
         "freeze", "crash", "memory", "cpu", "resource", "slow response",
         "loading slow", "rendering slow", "query slow", "database slow",
         "high latency", "bottleneck", "throughput", "responsiveness",
         "hang", "unresponsive", "junk", "garbage collection"
-    ],
-    IssueCategory.INTEGRATION: [
+    ),
+    IssueCategory.INTEGRATION: (
         "integration", "api", "sync", "connect", "plugin", "integrate",
         "integration failed", "sync error", "connection error", "api error",
         "webhook", "rest", "soap", "data exchange", "third party",
         "external system", "interface", "middleware", "integration point",
         "data sync", "real-time sync", "background sync"
-    ],
-    IssueCategory.DATA_CONFIG: [
+    ),
+    IssueCategory.DATA_CONFIG: (
         "data", "config", "setting", "field", "code", "configuration",
         "data corruption", "config error", "field missing", "invalid data",
         "data lost", "data inconsistent", "config file", "parameter",
         "environment variable", "property", "attribute", "metadata",
         "custom field", "mapping", "validation", "schema"
-    ],
+    ),
 }
 
+# Characters that continue a word; a keyword only matches where it starts a
+# word, so "login" matches "login failed" but not "prologin"
+_WORD_CHARS: Final[frozenset[str]] = frozenset(string.ascii_lowercase + string.digits)
+
+def _starts_word(text: str, start: int) -> bool:
+    """Check whether position start in text begins a word."""
+    return start == 0 or text[start - 1] not in _WORD_CHARS
+
+def _contains_keyword(text: str, keyword: str) -> bool:
+    """Check whether keyword occurs in text at the start of a word."""
+    start = text.find(keyword)
+    while start != -1:
+        if _starts_word(text, start):
+            return True
+        start = text.find(keyword, start + 1)
+    return False
+
+def _minimize_keywords(
+    table: dict[IssueCategory, tuple[str, ...]]
+) -> dict[IssueCategory, tuple[str, ...]]:
+    """Drop keywords that can never decide the category.
+
+    A keyword is redundant when a keyword of the same or an earlier
+    category occurs inside it at a word start (e.g. "license expired"
+    is covered by "license", and DATA_CONFIG's "configuration" by
+    INSTALLATION's): any text matching it already matches the other
+    one at equal or higher priority. Survivors are sorted longest first.
+    """
+    minimized: dict[IssueCategory, tuple[str, ...]] = {}
+    earlier: list[str] = []
+    for category, keywords in table.items():
+        candidates = [kw for kw in dict.fromkeys(keywords) if kw not in earlier]
+        pool = earlier + candidates
+        survivors = [
+            kw for kw in candidates
+            if not any(other != kw and _contains_keyword(kw, other) for other in pool)
+        ]
+        survivors.sort(key=len, reverse=True)
+        minimized[category] = tuple(survivors)
+        earlier.extend(survivors)
+    return minimized
+
+CATEGORY_KEYWORDS_MIN: Final[dict[IssueCategory, tuple[str, ...]]] = _minimize_keywords(CATEGORY_KEYWORDS)
+
+# Inverted index: keyword -> (priority, category), priority being the
+# category's position in the table (lower wins). Insertion order is
+# priority first, then longest keyword first.
+_KEYWORD_INDEX: Final[dict[str, tuple[int, IssueCategory]]] = {
+    kw: (priority, category)
+    for priority, (category, keywords) in enumerate(CATEGORY_KEYWORDS_MIN.items())
+    for kw in keywords
+}
+
+def _build_keyword_automaton():
+    """Compile _KEYWORD_INDEX into a single Aho-Corasick automaton.
+
+    Each keyword carries its (priority, category, length) so a hit
+    resolves without any further lookup.
+    """
+    if ahocorasick is None:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for kw, (priority, category) in _KEYWORD_INDEX.items():
+        automaton.add_word(kw, (priority, category, len(kw)))
+    automaton.make_automaton()
+    return automaton
+
+def _build_keyword_pattern() -> re.Pattern:
+    """Compile _KEYWORD_INDEX into one alternation regex over bytes.
+
+    Used when pyahocorasick is unavailable. Alternatives follow the index
+    order, so at each word start the regex captures the highest priority
+    keyword there; the lookahead makes every word start a candidate, so
+    overlapping keywords are not skipped.
+
+    Keywords are ASCII, so the pattern runs on UTF-8 bytes: one byte per
+    character even when the message contains emoji or other wide
+    characters, and multi-byte sequences can never match a keyword.
+    """
+    alternation = b"|".join(re.escape(kw.encode("ascii")) for kw in _KEYWORD_INDEX)
+    return re.compile(rb"(?<![a-z0-9])(?=(" + alternation + rb"))")
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+_KEYWORD_PATTERN = _build_keyword_pattern()
+_PATTERN_INDEX: Final[dict[bytes, tuple[int, IssueCategory]]] = {kw.encode("ascii"): hit for kw, hit in _KEYWORD_INDEX.items()}
+
+# Longer inputs are classified without caching so one pathological message
+# cannot pin large strings in the cache
+_CLASSIFY_CACHE_MAX_LEN: Final = 4096
+
 def classify_issue_category(text: str) -> IssueCategory:
     """Classify issue based on keywords - always returns valid enum."""
-    desc_lower = text.lower()
-    
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        if any(kw in desc_lower for kw in keywords):
-            return category
+    return classify_lowered_issue_category(text.lower())
+
+def classify_lowered_issue_category(desc_lower: str) -> IssueCategory:
+    """Classify already lowercased text (skips the lower() copy).
+
+    Runs of whitespace are collapsed to single spaces first, so results
+    are memoized per normalized text (shared across casing, line breaks
+    and spacing) and multi-word keywords match across line breaks.
+    """
+    if len(desc_lower) > _CLASSIFY_CACHE_MAX_LEN:
+        return _classify_lowered(" ".join(desc_lower.split()))
+    return _classify_cached(" ".join(desc_lower.split()))
+
+def _classify_lowered(desc_lower: str) -> IssueCategory:
+    """Scan lowercased text for the highest priority category keyword."""
+    best: Optional[tuple[int, IssueCategory]] = None
+    if _KEYWORD_AUTOMATON is not None:
+        # Single linear pass over the text; keep the highest priority hit
+        for end, (priority, category, length) in _KEYWORD_AUTOMATON.iter(desc_lower):
+            if best is not None and priority >= best[0]:
+                continue
+            if not _starts_word(desc_lower, end - length + 1):
+                continue
+            best = (priority, category)
+            if priority == 0:
+                break
+        return best[1] if best else IssueCategory.OTHER
     
-    return IssueCategory.OTHER
+    # Fallback: one regex pass, one candidate per word start
+    for match in _KEYWORD_PATTERN.finditer(desc_lower.encode("utf-8")):
+        hit = _PATTERN_INDEX[match.group(1)]
+        if best is None or hit[0] < best[0]:
+            best = hit
+            if best[0] == 0:
+                break
+    return best[1] if best else IssueCategory.OTHER
+
+# Agents often re-save the same description (retries, tool loops)
+_classify_cached = lru_cache(maxsize=4096)(_classify_lowered)
+
+def _normalize(text: str) -> str:
+    """Normalize free text once for keyword and alias lookups."""
+    # Strip first so lower() copies the shorter string
+    return text.strip().lower()
+
+# Field setters for _save_any_field - each validates via the session
+# property and returns the tool result
+_FieldSetter = Callable[[SupportSession, str], dict]
+
+def _set_issue_description(session: SupportSession, value: str) -> dict:
+    session.issue_description = value
+    category = classify_issue_category(value)
+    session.issue_category = category
+    return {
+        "ok": True, 
+        "field": "issue_description", 
+        "value": value,
+        "category": category.value
+    }
+
+def _set_user_name(session: SupportSession, value: str) -> dict:
+    session.user_name = value
+    return {"ok": True, "field": "user_name", "value": value}
+
+def _set_company_name(session: SupportSession, value: str) -> dict:
+    session.company_name = value
+    return {"ok": True, "field": "company_name", "value": value}
+
+def _set_software(session: SupportSession, value: str) -> dict:
+    session.software = value
+    return {"ok": True, "field": "software", "value": session.software}
+
+def _set_environment(session: SupportSession, value: str) -> dict:
+    session.environment = value
+    return {"ok": True, "field": "environment", "value": session.environment.value}
+
+def _set_impact(session: SupportSession, value: str) -> dict:
+    session.impact = value
+    return {"ok": True, "field": "impact", "value": session.impact.value}
+
+# Exact field names the LLM is told to use (see FUNCTION_DEFS) and common aliases
+_FIELD_SETTERS: Final[dict[str, _FieldSetter]] = {
+    "issue description": _set_issue_description,
+    "issue_description": _set_issue_description,
+    "description": _set_issue_description,
+    "issue": _set_issue_description,
+    "user name": _set_user_name,
+    "user_name": _set_user_name,
+    "name": _set_user_name,
+    "company": _set_company_name,
+    "company name": _set_company_name,
+    "company_name": _set_company_name,
+    "software": _set_software,
+    "system": _set_software,
+    "environment": _set_environment,
+    "impact": _set_impact,
+}
+
+# Fuzzy fallback for other phrasings, checked in order
+_FIELD_FALLBACKS: Final[tuple[tuple[tuple[str, ...], _FieldSetter], ...]] = (
+    (("description", "issue"), _set_issue_description),
+    (("company",), _set_company_name),
+    (("name",), _set_user_name),
+    (("software", "system"), _set_software),
+    (("environment",), _set_environment),
+    (("impact",), _set_impact),
+)
 
 async def _save_any_field(field_name: str, value: str, *, chat_id: int) -> dict:
     """Save any field with validation."""
     session = get_or_create_session(chat_id)
-    field_name = field_name.lower().strip()
+    field_name = _normalize(field_name)
     
-    try:
-        if "description" in field_name or "issue" in field_name:
-            session.issue_description = value
-            session.issue_category = classify_issue_category(value)
-            return {
-                "ok": True, 
-                "field": "issue_description", 
-                "value": value,
-                "category": session.issue_category.value
-            }
-        
-        elif "name" in field_name and "company" not in field_name:
-            session.user_name = value
-            return {"ok": True, "field": "user_name", "value": value}
-        
-        elif "company" in field_name:
-            session.company_name = value
-            return {"ok": True, "field": "company_name", "value": value}
-        
-        elif "software" in field_name or "system" in field_name:
-            session.software = value
-            return {"ok": True, "field": "software", "value": session.software}
-        
-        elif "environment" in field_name:
-            session.environment = value
-            return {"ok": True, "field": "environment", "value": session.environment.value}
-        
-        elif "impact" in field_name:
-            session.impact = value
-            return {"ok": True, "field": "impact", "value": session.impact.value}
-        
+    setter = _FIELD_SETTERS.get(field_name)
+    if setter is None:
+        for fragments, candidate in _FIELD_FALLBACKS:
+            if any(fragment in field_name for fragment in fragments):
+                setter = candidate
+                break
         else:
             return {"ok": False, "error": f"Unknown field: {field_name}"}
     
+    try:
+        return setter(session, value)
     except ValidationError as e:
         return {"ok": False, "error": str(e)}
 
@@ -131,25 +314,17 @@ async def _confirm_and_create_ticket(confirmed: bool, *, chat_id: int) -> dict:
         return {"ok": True, "confirmed": False}
     
     # Check all required fields are present and valid
-    required_fields = {
-        "user_name": session.user_name,
-        "company_name": session.company_name,
-        "issue_description": session.issue_description,
-        "software": session.software,
-        "environment": session.environment,
-        "impact": session.impact
-    }
-    
-    missing = [name for name, value in required_fields.items() if not value]
-    
-    if missing:
+    missing_mask = ALL_REQUIRED_MASK & ~session.filled_mask
+    if missing_mask:
+        missing = [name for name, bit in REQUIRED_FIELD_BITS.items() if missing_mask & bit]
         return {
             "ok": False,
             "error": f"Missing required information: {', '.join(missing)}"
         }
     
     try:
-        ticket = create_ticket_from_session(session)
+        # Persisting appends to the ticket log - keep the file I/O off the loop
+        ticket = await asyncio.to_thread(create_ticket_from_session, session)
         if ticket:
             session.ticket_created = True
             return {
@@ -169,40 +344,50 @@ async def _get_session_data(*, chat_id: int) -> dict:
         "user_name": session.user_name,
         "company_name": session.company_name,
         "issue_description": session.issue_description,
-        "issue_category": session.issue_category.value if session.issue_category else None,
+        "issue_category": session.issue_category,
         "software": session.software,
-        "environment": session.environment.value if session.environment else None,
-        "impact": session.impact.value if session.impact else None,
+        "environment": session.environment,
+        "impact": session.impact,
         "attachments_count": len(session.attachments),
-        "completeness": _calculate_completeness(session),
+        "completeness": dict(_COMPLETENESS_BY_MASK[session.filled_mask]),
     }
 
-def _calculate_completeness(session) -> dict:
-    """Calculate what's been collected."""
-    fields = {
-        "user_name": session.user_name is not None,
-        "company_name": session.company_name is not None,
-        "issue_description": session.issue_description is not None,
-        "software": session.software is not None,
-        "environment": session.environment is not None,
-        "impact": session.impact is not None,
-    }
-    collected = sum(1 for v in fields.values() if v)
+_REQUIRED_FIELD_COUNT: Final = 6
+_PERCENT_PER_FIELD: Final = 100 / _REQUIRED_FIELD_COUNT
+
+def _completeness_of(filled_mask: int) -> dict:
+    """Summarize a SupportSession.filled_mask."""
+    missing = tuple(name for name, bit in REQUIRED_FIELD_BITS.items() if not filled_mask & bit)
+    collected = _REQUIRED_FIELD_COUNT - len(missing)
     return {
         "collected": collected,
-        "total": len(fields),
-        "percentage": (collected / len(fields)) * 100,
-        "missing_fields": [k for k, v in fields.items() if not v]
+        "total": _REQUIRED_FIELD_COUNT,
+        "percentage": collected * _PERCENT_PER_FIELD,
+        "missing_fields": missing
     }
 
+# One summary per possible filled_mask (64), shared between callers - treat
+# them as read-only
+_COMPLETENESS_BY_MASK: Final[tuple[dict, ...]] = tuple(
+    _completeness_of(mask) for mask in range(ALL_REQUIRED_MASK + 1)
+)
+
+def _calculate_completeness(session: SupportSession) -> dict:
+    """Calculate what's been collected."""
+    return _COMPLETENESS_BY_MASK[session.filled_mask]
+
+# Enum options never change at runtime, so build them once. Values are tuples
+# and the dict is shared between callers - treat it as read-only.
+_AVAILABLE_OPTIONS: Final[dict[str, tuple[str, ...]]] = {
+    "environments": tuple(e.value for e in Environment),
+    "impact_levels": tuple(e.value for e in ImpactLevel),
+    "categories": tuple(e.value for e in IssueCategory),
+    "software": tuple(SUPPORTED_SOFTWARE.values()),
+}
+
 def _get_available_options() -> dict:
-    """Return all available enum options dynamically."""
-    return {
-        "environments": [e.value for e in Environment],
-        "impact_levels": [e.value for e in ImpactLevel],
-        "categories": [e.value for e in IssueCategory],
-        "software": list(SUPPORTED_SOFTWARE.values()),
-    }
+    """Return all available enum options (shared, read-only)."""
+    return _AVAILABLE_OPTIONS
 
 # Tool definitions with validation
 FUNCTION_DEFS: list[Dict[str, Any]] = [
@@ -27,6 +27,13 @@ class CacheTTL(str, Enum):
     # Static data - rarely changes
     COMPANY_LIST = "3600"
     COMPANY_DETAIL = "3600"
+    
+    # Content-addressed LLM results - only change with the model
+    VISION_ANALYSIS = "3600"
+    LLM_REPLY = "600"
+    
+    # Telegram bot conversation history - idle chats expire
+    CONVERSATION_HISTORY = "3600"
 
 
 # Cache key patterns
@@ -55,6 +62,11 @@ CACHE_KEY_PATTERNS = {
     # Queue
     "queue:stats": "queue:stats:company-{company_id}",
     "queue:status": "queue:status:{task_id}",
+    
+    # Telegram bot LLM calls
+    "vision:analysis": "vision:analysis:{model}:fields:{image_hash}",
+    "llm:reply": "llm:reply:{model}:{context_hash}",
+    "conversation:history": "conversation:history:{chat_id}",
 }
 
 # Invalidation tag hierarchy (what gets invalidated when)
@@ -11,17 +11,32 @@ from sqlalchemy.orm import sessionmaker, Session, relationship
 from contextlib import contextmanager
 from datetime import datetime, date
 import uuid
+from typing import Optional
 
-from .config import DATABASE_URL
+from .config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create engine
-engine = create_engine(DATABASE_URL, echo=False, pool_pre_ping=True)
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only sessions for analytics queries - AUTOCOMMIT skips the implicit
+# BEGIN/ROLLBACK round trips. Shares the engine's pool; never use for writes
+ReadSessionLocal = sessionmaker(
+    autoflush=False,
+    bind=engine.execution_options(isolation_level="AUTOCOMMIT"),
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -371,6 +386,12 @@ class Embedding(Base):
         CheckConstraint("source_type IN ('ticket_summary', 'ticket_description', 'resolution', 'rca', 'log_snippet','ir')"),
         Index("idx_embedding_company_active", "company_id", "is_active"),
         Index("idx_embedding_ticket", "ticket_id"),
+        # Deprecation and re-embedding look up a ticket's live embeddings
+        # (optionally by source_type); deprecated rows stay out of the index
+        Index(
+            "idx_embedding_ticket_active", "ticket_id", "source_type",
+            postgresql_where=text("is_active")
+        ),
         Index("idx_embedding_attachment", "attachment_id"),
         Index("idx_embedding_rca_attachment", "rca_attachment_id"),
         Index("idx_embedding_created_at", "created_at"),
@@ -551,6 +572,26 @@ def get_db_context():
         db.close()
 
 
+@contextmanager
+def reuse_or_open_session(db: Optional[Session] = None):
+    """
+    Context manager yielding the caller's session, or a new one if None.
+    
+    Lets a service method run on the session its caller already holds
+    instead of checking out another connection. Only a session opened
+    here is closed on exit.
+    """
+    if db is not None:
+        yield db
+        return
+    
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 def init_db():
     """Create all tables in database"""
     try:
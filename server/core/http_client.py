@@ -0,0 +1,23 @@
+# server/core/http_client.py
+"""Shared HTTP clients for outbound API calls"""
+import importlib.util
+import logging
+
+import httpx
+
+# httpx only speaks HTTP/2 when h2 is installed
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+if not HTTP2_ENABLED:
+    logging.warning("h2 not installed. Install with: pip install 'httpx[http2]'")
+
+# Streamed download chunk size
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Shared Telegram HTTP client - keeps connections alive across messages and,
+# with HTTP/2, multiplexes concurrent sends over one connection. Used by the
+# bot webhook and the chat routes; closed on app shutdown
+telegram_http = httpx.AsyncClient(
+    http2=HTTP2_ENABLED,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=httpx.Timeout(10.0, connect=3.0),
+)
@@ -1,7 +1,11 @@
 # server/core/logger.py
 """Structured logging setup with JSON formatter"""
+import atexit
+import copy
 import logging
+import logging.handlers
 import json
+import queue
 import sys
 from datetime import datetime
 
@@ -29,6 +33,42 @@ class JSONFormatter(logging.Formatter):
         return json.dumps(log_data)
 
 
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records without formatting them in the caller.
+    
+    The stock prepare() formats in the logging thread and drops exc_info;
+    here only the message is resolved, so JSONFormatter still sees the
+    exception and all formatting happens on the listener thread.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+# Records from every get_logger() logger go through one queue; a background
+# thread formats and writes them so slow stdout never blocks the event loop
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_queue_handler = _DeferredQueueHandler(_log_queue)
+_listener = None
+
+
+def _start_listener() -> None:
+    """Start the stdout writer thread once per process; flushed at exit."""
+    global _listener
+    if _listener is not None:
+        return
+    
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JSONFormatter())
+    _listener = logging.handlers.QueueListener(_log_queue, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
 def get_logger(name: str, level: int = logging.INFO) -> logging.Logger:
     """
     Get configured logger instance.
@@ -44,9 +84,8 @@ def get_logger(name: str, level: int = logging.INFO) -> logging.Logger:
     
     # Only configure if not already configured
     if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setFormatter(JSONFormatter())
-        logger.addHandler(handler)
+        _start_listener()
+        logger.addHandler(_queue_handler)
         logger.setLevel(level)
     
     return logger
\ No newline at end of file
@@ -108,6 +108,25 @@ def create_attachment_summary_table():
         db.close()
 
 
+def create_active_embedding_index():
+    """Create the partial index on active embeddings if it doesn't exist"""
+    try:
+        # CONCURRENTLY can't run inside a transaction, and avoids locking
+        # the embedding table against writes while the index builds
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_embedding_ticket_active
+            ON embedding (ticket_id, source_type)
+            WHERE is_active
+            """))
+        logger.info("✓ idx_embedding_ticket_active index ready")
+        return True
+    
+    except Exception as e:
+        logger.error(f"Failed to create idx_embedding_ticket_active index: {e}")
+        return False
+
+
 def run_all_migrations():
     """Run all database migrations"""
     logger.info("\n" + "="*70)
@@ -117,6 +136,7 @@ def run_all_migrations():
     success = True
     success = create_queued_task_table() and success
     success = create_attachment_summary_table() and success
+    success = create_active_embedding_index() and success
     
     if success:
         logger.info("\n✓ All migrations completed successfully\n")
@@ -12,27 +12,52 @@ Features:
 """
 
 import os
-import sys
-import requests
-import base64
-import mimetypes
+import re
+import json
+import math
+import logging
+import asyncio
+import contextvars
+import binascii
+import hashlib
+import mmap
+import weakref
+from collections import OrderedDict
 from enum import Enum
 from datetime import date
+from urllib.parse import quote
 
 # FastAPI
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 # Groq AI
-from groq import Groq
+from groq import AsyncGroq, DefaultAsyncHttpxClient
+
+try:
+    import ahocorasick
+except ImportError:
+    logging.warning("pyahocorasick not installed. Install with: pip install pyahocorasick")
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:
+    logging.warning("orjson not installed. Install with: pip install orjson")
+    orjson = None
 
 # Core imports
-from core.database import init_db, test_connection
-from core.config import CORS_ORIGINS, TELEGRAM_TOKEN, TELEGRAM_API, GROQ_API_KEY, MODEL, VISION_MODEL
+from core.database import init_db
+from core.config import (
+    CORS_ORIGINS, TELEGRAM_TOKEN, TELEGRAM_API, TELEGRAM_DEBOUNCE_MS, UPLOADS_PUBLIC_BASE_URL,
+    GROQ_API_KEY, MODEL, VISION_MODEL,
+)
+from core.cache_config import CACHE_KEY_PATTERNS, get_ttl
 from core.logger import get_logger
+from core.http_client import HTTP2_ENABLED, DOWNLOAD_CHUNK_SIZE, telegram_http
 
 from utils.datetime_utils import to_iso_date
-from services.redis_cache_service import init_cache, close_cache
+from services.redis_cache_service import init_cache, close_cache, get_cache
 
 # Middleware
 from middleware.error_handler import register_error_handlers
@@ -56,17 +81,19 @@ from routes.zoho_oauth_routes import router as zoho_oauth_router
 # Legacy session management (keeping for bot compatibility)
 from session import (
     IssueCategory,
-    get_or_create_session,
+    session_scope,
     clear_session,
     ValidationError,
-    SUPPORTED_SOFTWARE
+    SUPPORTED_SOFTWARE,
+    ALL_REQUIRED_MASK,
+    REQUIRED_FIELD_BITS,
 )
 
 # Legacy agent functions
 from agent_functions import (
     classify_issue_category,
+    classify_lowered_issue_category,
     _confirm_and_create_ticket,
-    _get_session_data,
     _get_available_options,
     _calculate_completeness
 )
@@ -79,25 +106,139 @@ from http_routes import http_router
 
 logger = get_logger(__name__)
 
-# Initialize Groq client
-groq_client = Groq(api_key=GROQ_API_KEY)
+# Initialize Groq client (async, so LLM calls don't block other chats).
+# HTTP/2 multiplexes concurrent completions over one connection; the
+# SDK's default client keeps its own timeouts and connection limits.
+groq_async_client = AsyncGroq(
+    api_key=GROQ_API_KEY,
+    http_client=DefaultAsyncHttpxClient(http2=HTTP2_ENABLED),
+)
+
+# Telegram payload (de)serialization - orjson when available
+if orjson is not None:
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+else:
+    json_loads = json.loads
+    
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode()
+
+JSON_HEADERS = {"Content-Type": "application/json"}
 
 # File size limits (in bytes)
 MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB for images
 MAX_VIDEO_SIZE = 20 * 1024 * 1024  # 20MB for videos
+IMAGE_MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
+# Outbound Telegram messages: one sender task per worker drains the outbox
+TELEGRAM_SEND_RATE = 30  # messages/sec, Telegram's bot-wide flood limit
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+TELEGRAM_COALESCE_SECONDS = 0.05  # gather window before each outbox batch
+telegram_outbox: asyncio.Queue = asyncio.Queue()
+telegram_sender_task: asyncio.Task | None = None
+
+# Telegram updates processed in the background at once (per worker). Tasks
+# are kept referenced until done so they aren't garbage collected
+MAX_CONCURRENT_UPDATES = 64
+update_semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPDATES)
+update_tasks: set[asyncio.Task] = set()
+
+# One lock per chat: a chat's updates run in arrival order while different
+# chats proceed in parallel. Entries vanish once no task holds the lock
+_chat_locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+
+# Recently accepted update_ids - Telegram redelivers an update when the ack
+# is lost or late, and a replay would re-run the LLM call (per worker)
+MAX_SEEN_UPDATES = 4096
+_seen_updates: OrderedDict[int, None] = OrderedDict()
+
+# Max attachments in the vision pipeline at once (per worker, Groq rate limits)
+VISION_CONCURRENCY = 4
+vision_semaphore = asyncio.Semaphore(VISION_CONCURRENCY)
 
 # Upload directory
-UPLOADS_DIR = "uploads"
-os.makedirs(UPLOADS_DIR, exist_ok=True)
+UPLOADS_DIR = "uploads"  # created on startup
+
+# Conversation history (temporary, per session), least recently used first
+MAX_CONVERSATIONS = 10_000
+MAX_HISTORY_MESSAGES = 10
+HISTORY_KEEP_MESSAGES = 4  # kept verbatim when the history is compacted
+MAX_HISTORY_CHARS = 6000  # ~1500 prompt tokens at ~4 chars per token
+conversation_state: OrderedDict[int, list] = OrderedDict()
+
+# Recent intake replies by reply-cache key, least recently used first - an
+# in-process tier in front of Redis (also covers Redis being down)
+MAX_LOCAL_REPLIES = 2048
+_local_replies: OrderedDict[str, str] = OrderedDict()
+
+# Valid options pre-joined for the LLM prompts (static per process)
+_OPTION_LISTS = {key: ", ".join(values) for key, values in _get_available_options().items()}
+
+# Per-turn session state block, filled in by run_llm: one line per
+# (session attribute, label), then the progress summary
+NOT_PROVIDED = '[not provided]'
+SESSION_CONTEXT_FIELDS = (
+    ("user_name", "User Name"),
+    ("company_name", "Company"),
+    ("issue_description", "Issue Description"),
+    ("issue_category", "Issue Category"),
+    ("software", "Software/System"),
+    ("environment", "Environment"),
+    ("impact", "Impact Level"),
+)
+SESSION_CONTEXT_TEMPLATE = """
+=== CURRENT SESSION STATE ===
+{fields}
+Attachments: {attachments_count} file(s)
+
+=== PROGRESS ===
+Collected: {collected}/{total} fields ({percentage:.0f}%)
+Missing: {missing}
+"""
+
+# Intake system prompt: identical for every session and turn, so it is built
+# once and kept ahead of the per-turn session state
+STATIC_SYSTEM_PROMPT = GATEKEEPER_PROMPT + f"""
+=== VALID OPTIONS ===
+Environments: {_OPTION_LISTS['environments']}
+Impact Levels: {_OPTION_LISTS['impact_levels']}
+Software: {_OPTION_LISTS['software']}
+
+=== CRITICAL INSTRUCTIONS ===
+1. ONLY ASK ONE QUESTION to collect missing fields
+2. Ask for missing fields ONLY (do not repeat)
+3. NEVER create a summary - system handles that
+4. NEVER hallucinate data
+5. Keep responses short (1-2 sentences)
+6. Acknowledge briefly before asking the next question
+7. Do not ask about attachments - system handles uploads
+"""
+# Opens every conversation request; built once and shared - never mutate
+SYSTEM_MESSAGE = {"role": "system", "content": STATIC_SYSTEM_PROMPT}
 
-# Conversation history (temporary, per session)
-conversation_state: dict[int, list] = {}
+# Groq reuses a cached prompt prefix once it reaches PROMPT_CACHE_MIN_TOKENS;
+# the static prompt alone should clear that so every turn starts with a hit
+PROMPT_CACHE_MIN_TOKENS = 1024
+CHARS_PER_TOKEN = 4  # rough estimate for English prompt text
+STATIC_PROMPT_TOKENS = len(STATIC_SYSTEM_PROMPT) // CHARS_PER_TOKEN
 
 # Validation
 if not TELEGRAM_TOKEN:
     logger.warning("Missing TELEGRAM_BOT_TOKEN - Telegram bot will not work")
 if not GROQ_API_KEY:
     logger.warning("Missing GROQ_API_KEY - AI features will not work")
+if STATIC_PROMPT_TOKENS < PROMPT_CACHE_MIN_TOKENS:
+    logger.warning(
+        f"Static system prompt is ~{STATIC_PROMPT_TOKENS} tokens, below the "
+        f"{PROMPT_CACHE_MIN_TOKENS}-token prompt cache minimum"
+    )
 
 # ==================== FASTAPI APPLICATION ====================
 
@@ -154,16 +295,19 @@ app.include_router(http_router)
 
 # ==================== TELEGRAM HELPER FUNCTIONS ====================
 
-def send_message(chat_id: int, text: str) -> bool:
+async def send_message(chat_id: int, text: str) -> bool:
     """
     Send message to Telegram chat.
     
+    Goes through the outbox when the sender task is running, otherwise
+    posts directly.
+    
     Args:
         chat_id: Telegram chat ID
         text: Message text
         
     Returns:
-        True if successful, False otherwise
+        True if queued or sent successfully, False otherwise
     """
     if not text or not text.strip():
         return False
@@ -172,18 +316,85 @@ def send_message(chat_id: int, text: str) -> bool:
         logger.warning("Telegram token not configured")
         return False
     
+    if telegram_sender_task is None or telegram_sender_task.done():
+        return await _post_message(chat_id, text)
+    
+    telegram_outbox.put_nowait((chat_id, text))
+    return True
+
+
+async def _post_message(chat_id: int, text: str) -> bool:
+    """Post one sendMessage call, retrying once if Telegram asks to back off."""
+    body = json_dumps({"chat_id": chat_id, "text": text})
     try:
-        resp = requests.post(
+        resp = await telegram_http.post(
             f"{TELEGRAM_API}/sendMessage",
-            json={"chat_id": chat_id, "text": text},
+            content=body,
+            headers=JSON_HEADERS,
             timeout=5
         )
+        if resp.status_code == 429:
+            retry_after = resp.json().get("parameters", {}).get("retry_after", 1)
+            logger.warning(f"Telegram flood limit hit, retrying chat {chat_id} in {retry_after}s")
+            await asyncio.sleep(retry_after)
+            resp = await telegram_http.post(
+                f"{TELEGRAM_API}/sendMessage",
+                content=body,
+                headers=JSON_HEADERS,
+                timeout=5
+            )
         return resp.status_code == 200
     except Exception as e:
         logger.error(f"Telegram send failed for chat {chat_id}: {e}")
         return False
 
 
+def _merge_messages(parts: list[str]) -> list[str]:
+    """Pack a chat's queued messages into as few Telegram messages as fit."""
+    merged: list[str] = []
+    for part in parts:
+        if merged and len(merged[-1]) + 2 + len(part) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+            merged[-1] = f"{merged[-1]}\n\n{part}"
+        else:
+            merged.append(part)
+    return merged
+
+
+async def telegram_sender() -> None:
+    """
+    Drain the outbox at no more than TELEGRAM_SEND_RATE messages per second.
+    
+    Everything queued within TELEGRAM_COALESCE_SECONDS of a batch's first
+    message, or while the previous batch was being sent, is grouped by chat
+    (keeping each chat's order) and merged, so a busy chat costs one
+    sendMessage call instead of several.
+    """
+    interval = 1 / TELEGRAM_SEND_RATE
+    next_send = 0.0
+    loop = asyncio.get_running_loop()
+    
+    while True:
+        chat_id, text = await telegram_outbox.get()
+        batch: dict[int, list[str]] = {chat_id: [text]}
+        taken = 1
+        await asyncio.sleep(TELEGRAM_COALESCE_SECONDS)
+        while not telegram_outbox.empty():
+            chat_id, text = telegram_outbox.get_nowait()
+            batch.setdefault(chat_id, []).append(text)
+            taken += 1
+        
+        for chat_id, parts in batch.items():
+            for message in _merge_messages(parts):
+                delay = next_send - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_send = max(next_send, loop.time()) + interval
+                await _post_message(chat_id, message)
+        
+        for _ in range(taken):
+            telegram_outbox.task_done()
+
+
 async def download_file(file_id: str, file_name: str, max_size: int = None) -> str | None:
     """
     Download file from Telegram.
@@ -200,11 +411,11 @@ async def download_file(file_id: str, file_name: str, max_size: int = None) -> s
         return None
     
     try:
-        meta = requests.get(
+        meta = (await telegram_http.get(
             f"{TELEGRAM_API}/getFile",
             params={"file_id": file_id},
             timeout=5
-        ).json()
+        )).json()
 
         if not meta.get("ok"):
             return None
@@ -218,55 +429,130 @@ async def download_file(file_id: str, file_name: str, max_size: int = None) -> s
             return None
 
         url = f"https://api.telegram.org/file/bot{TELEGRAM_TOKEN}/{file_path}"
-        content = requests.get(url, timeout=10)
-
-        if content.status_code == 200:
-            safe_name = os.path.basename(file_name)
-            local_path = os.path.join(UPLOADS_DIR, safe_name)
+        safe_name = os.path.basename(file_name)
+        local_path = os.path.join(UPLOADS_DIR, safe_name)
+        
+        # Stream to disk so a large upload is never held in memory
+        async with telegram_http.stream("GET", url, timeout=10) as response:
+            if response.status_code != 200:
+                return None
             
-            with open(local_path, "wb") as f:
-                f.write(content.content)
+            written = 0
+            completed = False
+            try:
+                with open(local_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        written += len(chunk)
+                        if max_size and written > max_size:
+                            break
+                        f.write(chunk)
+                    else:
+                        completed = True
+            finally:
+                if not completed:
+                    os.remove(local_path)
             
-            logger.info(f"Downloaded file: {local_path}")
-            return local_path
-        else:
-            return None
+            if not completed:
+                logger.warning(f"File {file_name} exceeds size limit while downloading: > {max_size}")
+                return None
+        
+        logger.info(f"Downloaded file: {local_path}")
+        return local_path
 
     except Exception as e:
         logger.error(f"File download failed: {e}")
         return None
 
 
-async def analyze_image_with_vision(image_path: str, chat_id: int) -> str | None:
+# Vision prompt: describe the screenshot, then list ticket fields under a
+# FIELDS: marker so one call covers both analysis and extraction
+VISION_FIELDS_MARKER = "FIELDS:"
+VISION_FIELDS = ("software", "environment", "impact", "issue_description")
+VISION_PROMPT = f"""Analyze this screenshot and identify:
+1. What application or system is shown?
+2. What error messages or status indicators are visible?
+3. What is the user trying to do?
+4. What appears to be wrong or blocked?
+
+Be specific and factual. Only describe what you see, don't speculate.
+
+Then add a line containing only {VISION_FIELDS_MARKER} and below it list ONLY these fields if visible,
+one per line in format: field: value
+Software: EXACT software name from: {_OPTION_LISTS['software']}
+Error: Error message or code (alphanumeric and spaces only)
+Environment: MUST be EXACTLY one of: {_OPTION_LISTS['environments']}
+Impact: MUST be EXACTLY one of: {_OPTION_LISTS['impact_levels']}
+
+Only use EXACT values from the options above. Do NOT invent or paraphrase values.
+If a field is not visible, do NOT include it."""
+# Albums go to the model in one request; the vision model accepts up to
+# VISION_MAX_IMAGES images per request
+VISION_MAX_IMAGES = 5
+VISION_ALBUM_PREFIX = "These {count} screenshots were sent together and show the same issue; treat them as one.\n"
+
+
+def _hash_image(image_path: str) -> str:
+    """SHA-256 of an image file, hashed straight from the mapped file."""
+    with open(image_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+        return hashlib.sha256(image).hexdigest()
+
+
+def _image_data_url(image_path: str, mime_type: str) -> str:
+    """Base64 data URL for an image file."""
+    # Encode straight from the mapped file (no raw bytes copy) and build
+    # the data URL as bytes, decoding once at the end
+    with open(image_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+        image_data = binascii.b2a_base64(image, newline=False)
+    return (b"data:" + mime_type.encode("ascii") + b";base64," + image_data).decode("ascii")
+
+
+async def analyze_image_with_vision(image_paths: list[str], chat_id: int) -> str | None:
     """
-    Analyze image using Groq's vision API.
+    Analyze images using Groq's vision API.
+    
+    Several images (an album) are analyzed together in one request.
     
     Args:
-        image_path: Path to local image file
+        image_paths: Paths to local image files (at most VISION_MAX_IMAGES)
         chat_id: Telegram chat ID for logging
         
     Returns:
-        Analysis text or None if failed
+        Analysis text, ending with the FIELDS: section, or None if failed
     """
     if not GROQ_API_KEY:
         logger.warning("OpenAI API key not configured")
         return None
     
     try:
-        # Read image and encode to base64
-        with open(image_path, "rb") as f:
-            image_data = base64.b64encode(f.read()).decode('utf-8')
+        # Users often re-send the same screenshot - key by content. Hashing
+        # and encoding read up to 5MB per image, so both run off the event loop
+        cache = await get_cache()
+        image_hashes = await asyncio.gather(*(asyncio.to_thread(_hash_image, path) for path in image_paths))
+        image_hash = image_hashes[0] if len(image_hashes) == 1 else hashlib.sha256("".join(image_hashes).encode()).hexdigest()
+        cache_key = CACHE_KEY_PATTERNS["vision:analysis"].format(model=VISION_MODEL, image_hash=image_hash)
+        cached = await cache.get(cache_key)
+        if cached:
+            logger.info(f"[{chat_id}] Image analysis cache hit")
+            return cached
         
-        # Determine media type
-        mime_type, _ = mimetypes.guess_type(image_path)
-        if not mime_type:
-            mime_type = "image/jpeg"
+        if UPLOADS_PUBLIC_BASE_URL:
+            base_url = UPLOADS_PUBLIC_BASE_URL.rstrip('/')
+            image_urls = [f"{base_url}/{quote(os.path.basename(path))}" for path in image_paths]
+        else:
+            image_urls = await asyncio.gather(*(
+                asyncio.to_thread(
+                    _image_data_url, path,
+                    IMAGE_MIME_TYPES.get(os.path.splitext(path)[1].lower(), "image/jpeg"),
+                )
+                for path in image_paths
+            ))
         
-        # Create data URL for base64 image
-        data_url = f"data:{mime_type};base64,{image_data}"
+        prompt = VISION_PROMPT
+        if len(image_paths) > 1:
+            prompt = VISION_ALBUM_PREFIX.format(count=len(image_paths)) + prompt
         
         # Call vision API
-        response = groq_client.chat.completions.create(
+        response = await groq_async_client.chat.completions.create(
             model=VISION_MODEL,
             messages=[
                 {
@@ -274,29 +560,27 @@ async def analyze_image_with_vision(image_path: str, chat_id: int) -> str | None
                     "content": [
                         {
                             "type": "text",
-                            "text": """Analyze this screenshot and identify:
-1. What application or system is shown?
-2. What error messages or status indicators are visible?
-3. What is the user trying to do?
-4. What appears to be wrong or blocked?
-
-Be specific and factual. Only describe what you see, don't speculate."""
+                            "text": prompt
                         },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": data_url,
-                            },
-                        }
+                        *(
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": image_url,
+                                },
+                            }
+                            for image_url in image_urls
+                        ),
                     ],
                 }
             ],
-            max_tokens=300,
-            temperature=0.2
+            max_tokens=400,
+            temperature=0.1
         )
         
         analysis = response.choices[0].message.content.strip()
-        logger.info(f"[{chat_id}] Image analysis complete")
+        logger.info(f"[{chat_id}] Image analysis complete ({len(image_paths)} image(s))")
+        await cache.set(cache_key, analysis, ttl=get_ttl("vision_analysis"))
         return analysis
     
     except Exception as e:
@@ -304,6 +588,22 @@ Be specific and factual. Only describe what you see, don't speculate."""
         return None
 
 
+# Vision extraction parsing tables (built once, reused per message)
+_EXTRACTION_LINE_RE = re.compile(r"^([^:\n]*):(.*)$", re.MULTILINE)
+_ERROR_DISALLOWED_RE = re.compile(r"[^\w .\-:]+")  # keep alphanumerics and " .-_:"
+_ENVIRONMENTS_BY_LOWER = {env.lower(): env for env in _get_available_options()["environments"]}
+_VISION_IMPACT_KEYWORDS = (
+    ("Completely blocked", ("completely", "fully", "blocked", "unable")),
+    ("Partially blocked", ("partial", "some")),
+    ("Slow but usable", ("slow", "sluggish", "lag", "usable")),
+)
+# One alternation per tier, tried in order
+_VISION_IMPACT_RES = tuple(
+    (impact, re.compile("|".join(map(re.escape, keywords))))
+    for impact, keywords in _VISION_IMPACT_KEYWORDS
+)
+
+
 async def extract_info_from_image_analysis(chat_id: int, analysis_text: str, session) -> None:
     """
     Extract structured information from image analysis.
@@ -313,116 +613,59 @@ async def extract_info_from_image_analysis(chat_id: int, analysis_text: str, ses
         analysis_text: Image analysis from vision API
         session: User session object
     """
-    if not analysis_text.strip() or not GROQ_API_KEY:
+    _, marker, extracted_data = analysis_text.rpartition(VISION_FIELDS_MARKER)
+    if not marker:
+        logger.info(f"[{chat_id}] Vision: no {VISION_FIELDS_MARKER} section in analysis")
         return
     
     try:
-        available_options = _get_available_options()
-        
-        # Use LLM to extract structured data from vision analysis
-        response = groq_client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""From this image analysis, extract ONLY these fields if mentioned.
-IMPORTANT: Only use EXACT values from the valid options below. Do NOT invent or paraphrase values.
-
-=== VALID OPTIONS ===
-Software: {', '.join(available_options['software'])}
-Environments: {', '.join(available_options['environments'])}
-Impact Levels: {', '.join(available_options['impact_levels'])}
-
-=== EXTRACTION TASK ===
-Extract these fields from the analysis if visible:
-1. Software: EXACT software name from the list above
-2. Error: Error message or code (alphanumeric and spaces only)
-3. Environment: MUST be EXACTLY one of: {', '.join(available_options['environments'])}
-4. Impact: MUST be EXACTLY one of: {', '.join(available_options['impact_levels'])}
-
-Image Analysis:
-{analysis_text}
-
-Respond ONLY with found fields in format: field: value (one per line)
-Example:
-Software: Teamcenter
-Error: Connection timeout
-Environment: Production
-Impact: Completely blocked
-
-If field not found, do NOT include it."""
-                }
-            ],
-            max_tokens=200,
-            temperature=0.1
-        )
-        
-        extracted_data = response.choices[0].message.content
         logger.info(f"[{chat_id}] Vision extraction output:\n{extracted_data}")
         
-        # Parse and apply extracted information
-        lines = extracted_data.split('\n')
-        for line in lines:
-            if not line.strip() or ':' not in line:
+        # Parse and apply extracted information ("Field: value" per line)
+        for match in _EXTRACTION_LINE_RE.finditer(extracted_data):
+            field = match.group(1).strip().lower()
+            value = match.group(2).strip()
+            if not value:
                 continue
+            value_lower = value.lower()
             
             try:
-                field, value = line.split(':', 1)
-                field = field.strip().lower()
-                value = value.strip()
-                
-                if not value:
-                    continue
-                
                 # Software extraction
                 if not session.software and 'software' in field:
-                    value_lower = value.lower()
-                    for keyword, software_name in SUPPORTED_SOFTWARE.items():
-                        if keyword in value_lower:
-                            try:
-                                session.software = software_name
-                                logger.info(f"[{chat_id}] Vision: Applied software = {software_name}")
-                            except ValidationError as e:
-                                logger.warning(f"[{chat_id}] Vision: Failed to apply software: {e}")
-                            break
+                    software_hit = _scan_field_keywords(value_lower).get("software")
+                    if software_hit:
+                        software_name = software_hit[1]
+                        try:
+                            session.software = software_name
+                            logger.info(f"[{chat_id}] Vision: Applied software = {software_name}")
+                        except ValidationError as e:
+                            logger.warning(f"[{chat_id}] Vision: Failed to apply software: {e}")
                 
                 # Environment extraction
                 elif not session.environment and 'environment' in field:
-                    valid_envs = available_options['environments']
-                    for env_option in valid_envs:
-                        if value.lower() == env_option.lower():
-                            try:
-                                session.environment = env_option
-                                logger.info(f"[{chat_id}] Vision: Applied environment = {env_option}")
-                            except ValidationError as e:
-                                logger.warning(f"[{chat_id}] Vision: Failed to apply environment: {e}")
-                            break
+                    env_option = _ENVIRONMENTS_BY_LOWER.get(value_lower)
+                    if env_option:
+                        try:
+                            session.environment = env_option
+                            logger.info(f"[{chat_id}] Vision: Applied environment = {env_option}")
+                        except ValidationError as e:
+                            logger.warning(f"[{chat_id}] Vision: Failed to apply environment: {e}")
                 
                 # Impact extraction
                 elif not session.impact and 'impact' in field:
-                    if any(kw in value.lower() for kw in ['completely', 'fully', 'blocked', 'unable']):
-                        try:
-                            session.impact = "Completely blocked"
-                            logger.info(f"[{chat_id}] Vision: Applied impact = Completely blocked")
-                        except ValidationError as e:
-                            logger.warning(f"[{chat_id}] Vision: Failed to apply impact: {e}")
-                    elif any(kw in value.lower() for kw in ['partial', 'some']):
-                        try:
-                            session.impact = "Partially blocked"
-                            logger.info(f"[{chat_id}] Vision: Applied impact = Partially blocked")
-                        except ValidationError as e:
-                            logger.warning(f"[{chat_id}] Vision: Failed to apply impact: {e}")
-                    elif any(kw in value.lower() for kw in ['slow', 'sluggish', 'lag', 'usable']):
-                        try:
-                            session.impact = "Slow but usable"
-                            logger.info(f"[{chat_id}] Vision: Applied impact = Slow but usable")
-                        except ValidationError as e:
-                            logger.warning(f"[{chat_id}] Vision: Failed to apply impact: {e}")
+                    for impact, impact_re in _VISION_IMPACT_RES:
+                        if impact_re.search(value_lower):
+                            try:
+                                session.impact = impact
+                                logger.info(f"[{chat_id}] Vision: Applied impact = {impact}")
+                            except ValidationError as e:
+                                logger.warning(f"[{chat_id}] Vision: Failed to apply impact: {e}")
+                            break
                 
                 # Issue description
-                elif not session.issue_description and 'error' in field and value:
-                    cleaned_value = ''.join(c if c.isalnum() or c in ' .-_:' else '' for c in value)
-                    if cleaned_value.strip():
+                elif not session.issue_description and 'error' in field:
+                    cleaned_value = _ERROR_DISALLOWED_RE.sub('', value).strip()
+                    if cleaned_value:
                         try:
                             session.issue_description = f"Error: {cleaned_value[:100]}"
                             session.issue_category = classify_issue_category(cleaned_value)
@@ -431,7 +674,7 @@ If field not found, do NOT include it."""
                             logger.warning(f"[{chat_id}] Vision: Failed to apply issue: {e}")
             
             except Exception as e:
-                logger.warning(f"[{chat_id}] Vision: Error parsing line '{line}': {e}")
+                logger.warning(f"[{chat_id}] Vision: Error parsing line '{match.group(0)}': {e}")
                 continue
     
     except Exception as e:
@@ -440,6 +683,88 @@ If field not found, do NOT include it."""
 
 # ==================== DATA EXTRACTION ====================
 
+# Keyword groups for try_extract_field. Within a group the lowest rank wins,
+# matching the order the checks used to run in
+_IMPACT_TIERS = (
+    ("Completely blocked", ("completely", "fully", "fully blocked", "unable to work", "blocked")),
+    ("Partially blocked", ("partial", "partially", "some features")),
+    ("Slow but usable", ("slow", "sluggish", "usable", "slower", "laggy")),
+)
+_ISSUE_KEYWORDS = (
+    "unable", "can't", "cannot", "problem", "issue", "error",
+    "slow", "blocked", "crash", "not working", "broken", "failed",
+)
+# Text containing any of these is never taken as a bare user name
+_NOT_A_NAME_KEYWORDS = (
+    "unable", "problem", "error", "slow", "blocked",
+    "prod", "test", "local", "uat",
+    "completely", "partial", "usable",
+)
+_ENV_KEYWORDS = {
+    "prod": "Production",
+    "production": "Production",
+    "uat": "Test / UAT",
+    "test": "Test / UAT",
+    "local": "Local system",
+}
+
+
+def _build_field_keyword_tags() -> dict[str, tuple[tuple[str, int, str | None], ...]]:
+    """Index every field keyword to the (group, rank, value) tags it sets."""
+    tags: dict[str, list] = {}
+    for rank, (keyword, software_name) in enumerate(SUPPORTED_SOFTWARE.items()):
+        tags.setdefault(keyword, []).append(("software", rank, software_name))
+    for rank, (impact, keywords) in enumerate(_IMPACT_TIERS):
+        for keyword in keywords:
+            tags.setdefault(keyword, []).append(("impact", rank, impact))
+    for keyword in _ISSUE_KEYWORDS:
+        tags.setdefault(keyword, []).append(("issue", 0, None))
+    for keyword in _NOT_A_NAME_KEYWORDS:
+        tags.setdefault(keyword, []).append(("not_name", 0, None))
+    for rank, (keyword, env_val) in enumerate(_ENV_KEYWORDS.items()):
+        tags.setdefault(keyword, []).append(("environment", rank, env_val))
+    return {keyword: tuple(group_tags) for keyword, group_tags in tags.items()}
+
+
+_FIELD_KEYWORD_TAGS = _build_field_keyword_tags()
+
+
+def _build_field_automaton():
+    """Compile _FIELD_KEYWORD_TAGS into one Aho-Corasick automaton."""
+    if ahocorasick is None:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, tags in _FIELD_KEYWORD_TAGS.items():
+        automaton.add_word(keyword, tags)
+    automaton.make_automaton()
+    return automaton
+
+
+_FIELD_AUTOMATON = _build_field_automaton()
+
+
+def _scan_field_keywords(t: str) -> dict[str, tuple[int, str | None]]:
+    """
+    Find every keyword group present in lowercased text in one pass.
+    
+    Returns:
+        Mapping of group -> (rank, value) for the best hit in each group
+    """
+    if _FIELD_AUTOMATON is not None:
+        matched = (tags for _, tags in _FIELD_AUTOMATON.iter(t))
+    else:
+        matched = (tags for keyword, tags in _FIELD_KEYWORD_TAGS.items() if keyword in t)
+    
+    hits: dict[str, tuple[int, str | None]] = {}
+    for tags in matched:
+        for group, rank, value in tags:
+            best = hits.get(group)
+            if best is None or rank < best[0]:
+                hits[group] = (rank, value)
+    return hits
+
+
 async def try_extract_field(chat_id: int, text: str, session) -> tuple[bool, str | None]:
     """
     Try to extract and save a single field from user input.
@@ -457,54 +782,32 @@ async def try_extract_field(chat_id: int, text: str, session) -> tuple[bool, str
     if not text or not t:
         return False, None
     
+    hits = _scan_field_keywords(t)
+    
     # Software (check FIRST before other patterns)
-    if not session.software:
-        text_lower = text.lower()
-        for keyword, software_name in SUPPORTED_SOFTWARE.items():
-            if keyword in text_lower:
-                try:
-                    session.software = software_name
-                    return True, "software"
-                except ValidationError:
-                    return False, None
+    if not session.software and "software" in hits:
+        try:
+            session.software = hits["software"][1]
+            return True, "software"
+        except ValidationError:
+            return False, None
     
     # Impact level
-    if not session.impact:
-        if any(w in t for w in ['completely', 'fully', 'fully blocked', 'unable to work', 'blocked']):
-            try:
-                session.impact = "Completely blocked"
-                return True, "impact"
-            except ValidationError:
-                return False, None
-        
-        elif any(w in t for w in ['partial', 'partially', 'some features']):
-            try:
-                session.impact = "Partially blocked"
-                return True, "impact"
-            except ValidationError:
-                return False, None
-        
-        elif any(w in t for w in ['slow', 'sluggish', 'usable', 'slower', 'laggy']):
-            try:
-                session.impact = "Slow but usable"
-                return True, "impact"
-            except ValidationError:
-                return False, None
+    if not session.impact and "impact" in hits:
+        try:
+            session.impact = hits["impact"][1]
+            return True, "impact"
+        except ValidationError:
+            return False, None
     
     # Issue description
     if not session.issue_description:
-        issue_keywords = [
-            'unable', "can't", 'cannot', 'problem', 'issue', 'error',
-            'slow', 'blocked', 'crash', 'not working', 'broken', 'failed'
-        ]
-        
         is_long = len(text) > 15
-        has_keyword = any(kw in t for kw in issue_keywords)
         
-        if is_long or has_keyword:
+        if is_long or "issue" in hits:
             try:
                 session.issue_description = text
-                session.issue_category = classify_issue_category(text)
+                session.issue_category = classify_lowered_issue_category(t)
                 return True, "issue_description"
             except ValidationError:
                 return False, None
@@ -520,13 +823,9 @@ async def try_extract_field(chat_id: int, text: str, session) -> tuple[bool, str
             except ValidationError:
                 return False, None
     
-    # Just user name
+    # Just user name (unless it reads like an issue, environment or impact)
     if not session.user_name and 2 < len(text) < 50:
-        is_issue = any(kw in t for kw in ['unable', 'problem', 'error', 'slow', 'blocked'])
-        is_env = any(kw in t for kw in ['prod', 'test', 'local', 'uat'])
-        is_impact = any(kw in t for kw in ['completely', 'partial', 'slow', 'usable'])
-        
-        if not is_issue and not is_env and not is_impact:
+        if "not_name" not in hits:
             try:
                 session.user_name = text
                 return True, "user_name"
@@ -542,22 +841,12 @@ async def try_extract_field(chat_id: int, text: str, session) -> tuple[bool, str
             return False, None
     
     # Environment
-    if not session.environment:
-        env_keywords = {
-            'prod': 'Production',
-            'production': 'Production',
-            'uat': 'Test / UAT',
-            'test': 'Test / UAT',
-            'local': 'Local system',
-        }
-        
-        for kw, env_val in env_keywords.items():
-            if kw in t:
-                try:
-                    session.environment = env_val
-                    return True, "environment"
-                except ValidationError:
-                    return False, None
+    if not session.environment and "environment" in hits:
+        try:
+            session.environment = hits["environment"][1]
+            return True, "environment"
+        except ValidationError:
+            return False, None
     
     return False, None
 
@@ -596,6 +885,24 @@ async def generate_summary(session) -> str:
     return summary
 
 
+# Summary fields in display order ('edit 1' is the first), and their names
+EDITABLE_FIELDS = (
+    ('user_name', 'Name'),
+    ('company_name', 'Company'),
+    ('software', 'Software'),
+    ('environment', 'Environment'),
+    ('issue_category', 'Category'),
+    ('impact', 'Impact'),
+    ('issue_description', 'Issue Description'),
+)
+EDIT_FIELD_ALIASES = {
+    name: index
+    for index, name in enumerate(('name', 'company', 'software', 'environment', 'category', 'impact', 'issue'))
+}
+# Lowercased category names for matching edited categories
+_CATEGORIES_LOWER = tuple((cat.value.lower(), cat) for cat in IssueCategory)
+
+
 async def process_pre_confirmation_edit(chat_id: int, edit_request: str, session) -> str:
     """
     Handle edit request before ticket confirmation.
@@ -608,28 +915,14 @@ async def process_pre_confirmation_edit(chat_id: int, edit_request: str, session
     Returns:
         Response message
     """
-    field_map = {
-        '1': ('user_name', 'Name'),
-        '2': ('company_name', 'Company'),
-        '3': ('software', 'Software'),
-        '4': ('environment', 'Environment'),
-        '5': ('issue_category', 'Category'),
-        '6': ('impact', 'Impact'),
-        '7': ('issue_description', 'Issue Description'),
-        'name': ('user_name', 'Name'),
-        'company': ('company_name', 'Company'),
-        'software': ('software', 'Software'),
-        'environment': ('environment', 'Environment'),
-        'category': ('issue_category', 'Category'),
-        'impact': ('impact', 'Impact'),
-        'issue': ('issue_description', 'Issue Description'),
-    }
-    
-    if edit_request not in field_map:
+    if edit_request.isdecimal() and 1 <= int(edit_request) <= len(EDITABLE_FIELDS):
+        attr_name, display_name = EDITABLE_FIELDS[int(edit_request) - 1]
+    elif edit_request in EDIT_FIELD_ALIASES:
+        attr_name, display_name = EDITABLE_FIELDS[EDIT_FIELD_ALIASES[edit_request]]
+    else:
         return "❌ Invalid field. Use 1-7 or field name"
     
-    attr_name, display_name = field_map[edit_request]
-    current_value = getattr(session, attr_name, None)
+    current_value = getattr(session, attr_name)
     
     session.edit_field_mode = True
     session.edit_field_name = attr_name
@@ -650,7 +943,7 @@ async def apply_pre_confirmation_edit(chat_id: int, new_value: str, session) ->
     Returns:
         Response message
     """
-    if not hasattr(session, 'edit_field_name') or not session.edit_field_name:
+    if not session.edit_field_name:
         return "❌ No field in edit mode. Use 'edit 1-7' first."
     
     attr_name = session.edit_field_name
@@ -668,20 +961,19 @@ async def apply_pre_confirmation_edit(chat_id: int, new_value: str, session) ->
             validated_value = session.software
         elif attr_name == 'environment':
             session.environment = new_value
-            validated_value = session.environment.value if hasattr(session.environment, 'value') else session.environment
+            validated_value = session.environment
         elif attr_name == 'issue_category':
-            category_matched = None
-            for cat in IssueCategory:
-                if new_value.lower() in cat.value.lower():
-                    session.issue_category = cat
-                    category_matched = cat.value
-                    break
+            value_lower = new_value.lower()
+            category_matched = next(
+                (cat for cat_lower, cat in _CATEGORIES_LOWER if value_lower in cat_lower), None
+            )
             if not category_matched:
-                return f"❌ Invalid category."
+                return "❌ Invalid category."
+            session.issue_category = category_matched
             validated_value = category_matched
         elif attr_name == 'impact':
             session.impact = new_value
-            validated_value = session.impact.value if hasattr(session.impact, 'value') else session.impact
+            validated_value = session.impact
         elif attr_name == 'issue_description':
             session.issue_description = new_value
             session.issue_category = classify_issue_category(new_value)
@@ -705,13 +997,165 @@ async def apply_pre_confirmation_edit(chat_id: int, new_value: str, session) ->
 
 # ==================== LLM INTEGRATION ====================
 
-async def run_llm(chat_id: int, user_text: str) -> str:
+# Reply phrases that mean the LLM is writing its own summary
+SUMMARY_INDICATORS = (
+    'issue category:', 'system and environment:', 'impact level:',
+    'here\'s', 'summary:', '1.', '2.', '3.',
+    'got it', 'thanks', 'understood', 'correct?'
+)
+_SUMMARY_INDICATOR_RE = re.compile("|".join(map(re.escape, SUMMARY_INDICATORS)))
+
+# Words that confirm the summary. A keyword must start a word and a single
+# letter must be the whole word, so "company" no longer counts as a "y"
+CONFIRMATION_KEYWORDS = ('yes', 'yeah', 'yep', 'y', 'confirm', 'ok', 'okey', 'correct', 'right', 'true', 'okay')
+_CONFIRMATION_RE = re.compile(
+    r"\b(?:" + "|".join(
+        re.escape(kw) + (r"\b" if len(kw) == 1 else "") for kw in CONFIRMATION_KEYWORDS
+    ) + ")"
+)
+
+# Fixed question per missing field. Used when the LLM drifts into a summary,
+# and to ask the next field without the LLM once a templated question got
+# its answer (tracked in session.last_prompted_field)
+NEXT_QUESTION_TEMPLATES = {
+    'user_name': "What's your full name?",
+    'company_name': "What company do you work for?",
+    'issue_description': "Can you describe the issue you're experiencing?",
+    'software': "Which software or system is affected?",
+    'environment': "Where are you experiencing this issue (Production, Test/UAT, or Local)?",
+    'issue_category': "What category best describes this issue?",
+    'impact': "How much are you blocked (completely, partially, or just slow)?",
+}
+
+
+async def _load_history(chat_id: int) -> list:
+    """
+    Get a chat's history.
+    
+    Redis holds it across restarts and workers; the in-process copy is the
+    fallback when Redis is unavailable.
+    """
+    cache = await get_cache()
+    history = await cache.get(CACHE_KEY_PATTERNS["conversation:history"].format(chat_id=chat_id))
+    if history is None:
+        history = conversation_state.get(chat_id, [])
+    return history
+
+
+async def _store_history(chat_id: int, history: list, user_text: str, reply: str) -> None:
+    """
+    Append a user/assistant exchange to a chat's history and save it,
+    keeping the prompt and the process bounded.
+    
+    The history list is updated in place. Past MAX_HISTORY_MESSAGES or
+    MAX_HISTORY_CHARS it is compacted to the last HISTORY_KEEP_MESSAGES
+    in one step rather than sliding by a turn: the kept messages then stay
+    an unchanged prompt prefix for the next few turns, and the facts from
+    dropped turns live on in the session state block. Oldest pairs are
+    dropped while still over MAX_HISTORY_CHARS. Evicts the least recently
+    active chat beyond MAX_CONVERSATIONS. Written through to Redis, where
+    idle chats expire after the conversation_history TTL.
+    """
+    history.append({"role": "user", "content": user_text})
+    history.append({"role": "assistant", "content": reply})
+    size = sum(len(m["content"]) for m in history)
+    if len(history) > MAX_HISTORY_MESSAGES or size > MAX_HISTORY_CHARS:
+        del history[:-HISTORY_KEEP_MESSAGES]
+        size = sum(len(m["content"]) for m in history)
+    while len(history) > 2 and size > MAX_HISTORY_CHARS:
+        size -= len(history[0]["content"]) + len(history[1]["content"])
+        del history[:2]
+    
+    conversation_state[chat_id] = history
+    conversation_state.move_to_end(chat_id)
+    while len(conversation_state) > MAX_CONVERSATIONS:
+        conversation_state.popitem(last=False)
+    
+    cache = await get_cache()
+    await cache.set(
+        CACHE_KEY_PATTERNS["conversation:history"].format(chat_id=chat_id),
+        history,
+        ttl=get_ttl("conversation_history"),
+    )
+
+
+async def _forget_history(chat_id: int) -> None:
+    """Drop a chat's history here and in Redis."""
+    conversation_state.pop(chat_id, None)
+    cache = await get_cache()
+    await cache.delete(CACHE_KEY_PATTERNS["conversation:history"].format(chat_id=chat_id))
+
+
+async def _get_cached_reply(cache_key: str) -> str | None:
+    """Look a reply up in the in-process tier, then in Redis."""
+    reply = _local_replies.get(cache_key)
+    if reply is not None:
+        _local_replies.move_to_end(cache_key)
+        return reply
+    
+    cache = await get_cache()
+    reply = await cache.get(cache_key)
+    if reply:
+        _remember_reply(cache_key, reply)
+    return reply
+
+
+def _remember_reply(cache_key: str, reply: str) -> None:
+    """Keep a reply in the in-process tier, evicting the least recently used."""
+    _local_replies[cache_key] = reply
+    _local_replies.move_to_end(cache_key)
+    while len(_local_replies) > MAX_LOCAL_REPLIES:
+        _local_replies.popitem(last=False)
+
+
+def _session_context(session) -> str:
+    """Render SESSION_CONTEXT_TEMPLATE, reusing the last render until the session changes."""
+    key = (session.version, len(session.attachments))
+    if session._context is not None and session._context[0] == key:
+        return session._context[1]
+    
+    completeness = _calculate_completeness(session)
+    missing_fields = completeness['missing_fields']
+    session_context = SESSION_CONTEXT_TEMPLATE.format(
+        fields="\n".join(
+            f"{label}: {getattr(session, name) or NOT_PROVIDED}"
+            for name, label in SESSION_CONTEXT_FIELDS
+        ),
+        attachments_count=len(session.attachments),
+        collected=completeness['collected'],
+        total=completeness['total'],
+        percentage=completeness['percentage'],
+        missing=', '.join(missing_fields) if missing_fields else 'None',
+    )
+    session._context = (key, session_context)
+    return session_context
+
+
+def _reply_cache_hash(session_context: str, history: list, user_text: str) -> str:
+    """Hash everything the intake reply depends on (case/spacing-insensitive text)."""
+    normalized = " ".join(user_text.lower().split())
+    payload = json.dumps([session_context, history, normalized], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def run_llm(
+    chat_id: int,
+    user_text: str,
+    session,
+    extract: bool = True,
+    filled_before: int | None = None
+) -> str:
     """
     Run LLM conversation for ticket intake.
     
     Args:
         chat_id: Telegram chat ID
         user_text: User message
+        session: User session object
+        extract: Run silent field extraction on user_text first
+        filled_before: session.filled_mask before the caller extracted
+            user_text's fields (with extract=False); defaults to the mask
+            on entry
         
     Returns:
         LLM response message
@@ -719,29 +1163,28 @@ async def run_llm(chat_id: int, user_text: str) -> str:
     if not GROQ_API_KEY:
         return "AI features not configured. Please contact administrator."
     
-    session = get_or_create_session(chat_id)
-    history = conversation_state.get(chat_id, [])
-    
     # Silent field extraction
-    await try_extract_field(chat_id, user_text, session)
+    if filled_before is None:
+        filled_before = session.filled_mask
+    if extract:
+        await try_extract_field(chat_id, user_text, session)
     
     # Get completeness status
     completeness = _calculate_completeness(session)
-    all_collected = completeness['collected'] == completeness['total']
+    all_collected = session.filled_mask == ALL_REQUIRED_MASK
     
     # ========== STEP 1: SUMMARY ALREADY SHOWN ==========
     if session.summary_shown and not session.ticket_created:
         user_lower = user_text.lower().strip()
         
-        if hasattr(session, 'edit_field_mode') and session.edit_field_mode:
+        if session.edit_field_mode:
             return await apply_pre_confirmation_edit(chat_id, user_text, session)
         
         if user_lower.startswith('edit '):
             edit_request = user_lower[5:].strip()
             return await process_pre_confirmation_edit(chat_id, edit_request, session)
         
-        confirmation_keywords = ['yes', 'yep', 'y', 'confirm', 'ok', 'okey', 'correct', 'right', 'true', 'okay']
-        user_says_yes = any(kw in user_lower for kw in confirmation_keywords)
+        user_says_yes = _CONFIRMATION_RE.search(user_lower) is not None
         
         if user_says_yes:
             result = await _confirm_and_create_ticket(True, chat_id=chat_id)
@@ -755,14 +1198,12 @@ async def run_llm(chat_id: int, user_text: str) -> str:
                 )
                 
                 clear_session(chat_id)
-                conversation_state.pop(chat_id, None)
+                await _forget_history(chat_id)
                 
                 return reply
             else:
                 error_msg = result.get("error", "Unknown error")
-                reply = f"Sorry, I couldn't create the ticket: {error_msg}"
-                send_message(chat_id, reply)
-                return reply
+                return f"Sorry, I couldn't create the ticket: {error_msg}"
         else:
             summary = await generate_summary(session)
             return summary
@@ -773,48 +1214,49 @@ async def run_llm(chat_id: int, user_text: str) -> str:
         summary = await generate_summary(session)
         return summary
     
-    # ========== STEP 3: CONTINUE COLLECTING DATA VIA LLM ==========
-    available_options = _get_available_options()
-    session_data = await _get_session_data(chat_id=chat_id)
-    
-    session_context = f"""
-=== CURRENT SESSION STATE ===
-User Name: {session_data.get('user_name') or '[not provided]'}
-Company: {session_data.get('company_name') or '[not provided]'}
-Issue Description: {session_data.get('issue_description') or '[not provided]'}
-Issue Category: {session_data.get('issue_category') or '[not provided]'}
-Software/System: {session_data.get('software') or '[not provided]'}
-Environment: {session_data.get('environment') or '[not provided]'}
-Impact Level: {session_data.get('impact') or '[not provided]'}
-Attachments: {session_data.get('attachments_count', 0)} file(s)
-
-=== PROGRESS ===
-Collected: {completeness['collected']}/{completeness['total']} fields ({completeness['percentage']:.0f}%)
-Missing: {', '.join(completeness['missing_fields']) if completeness['missing_fields'] else 'None'}
-
-=== VALID OPTIONS ===
-Environments: {', '.join(available_options['environments'])}
-Impact Levels: {', '.join(available_options['impact_levels'])}
-Software: {', '.join(available_options['software'])}
-
-=== CRITICAL INSTRUCTIONS ===
-1. ONLY ASK ONE QUESTION to collect missing fields
-2. Ask for missing fields ONLY (do not repeat)
-3. NEVER create a summary - system handles that
-4. NEVER hallucinate data
-5. Keep responses short (1-2 sentences)
-6. Acknowledge briefly before asking the next question
-7. Do not ask about attachments - system handles uploads
-"""
-    
+    # ========== STEP 3: ANSWER TO A TEMPLATED QUESTION ==========
+    # This message filled exactly the field we just asked for - ask for the
+    # next one from the template instead of another LLM round trip
+    prompted = session.last_prompted_field
+    session.last_prompted_field = None
+    missing = completeness['missing_fields']
+    if (
+        prompted
+        and missing
+        and session.filled_mask ^ filled_before == REQUIRED_FIELD_BITS[prompted]
+    ):
+        reply = NEXT_QUESTION_TEMPLATES[missing[0]]
+        session.last_prompted_field = missing[0]
+        logger.info(f"[{chat_id}] Got {prompted}, asking for {missing[0]} without LLM")
+        await _store_history(chat_id, await _load_history(chat_id), user_text, reply)
+        return reply
+    
+    # ========== STEP 4: CONTINUE COLLECTING DATA VIA LLM ==========
+    history = await _load_history(chat_id)
+    session_context = _session_context(session)
+    
+    # Static prompt, then the append-only history, form a stable prefix the
+    # provider can reuse; the per-turn session state goes last
     messages = [
-        {"role": "system", "content": GATEKEEPER_PROMPT + session_context},
+        SYSTEM_MESSAGE,
         *history,
+        {"role": "system", "content": session_context},
         {"role": "user", "content": user_text}
     ]
     
+    # Identical state, history and message (e.g. every new chat opening with
+    # "hi") get the same answer - reuse it instead of another Groq call
+    cache_key = CACHE_KEY_PATTERNS["llm:reply"].format(
+        model=MODEL, context_hash=_reply_cache_hash(session_context, history, user_text)
+    )
+    cached_reply = await _get_cached_reply(cache_key)
+    if cached_reply:
+        logger.info(f"[{chat_id}] LLM reply cache hit")
+        await _store_history(chat_id, history, user_text, cached_reply)
+        return cached_reply
+    
     try:
-        resp = groq_client.chat.completions.create(
+        resp = await groq_async_client.chat.completions.create(
             model=MODEL,
             messages=messages,
             temperature=0.35,
@@ -828,47 +1270,55 @@ Software: {', '.join(available_options['software'])}
             reply = "Could you tell me a bit more about what you're experiencing?"
         
         # Filter LLM-generated summaries
-        summary_indicators = [
-            'issue category:', 'system and environment:', 'impact level:',
-            'here\'s', 'summary:', '1.', '2.', '3.',
-            'got it', 'thanks', 'understood', 'correct?'
-        ]
-        
-        is_summary_attempt = (
-            any(indicator in reply.lower() for indicator in summary_indicators) and
-            ':' in reply
-        )
+        is_summary_attempt = ':' in reply and _SUMMARY_INDICATOR_RE.search(reply.lower()) is not None
         
         if is_summary_attempt:
             logger.warning(f"[{chat_id}] LLM attempted to generate summary, filtering it out")
             
-            if completeness['missing_fields']:
-                next_field = completeness['missing_fields'][0]
-                question_map = {
-                    'user_name': "What's your full name?",
-                    'company_name': "What company do you work for?",
-                    'issue_description': "Can you describe the issue you're experiencing?",
-                    'software': "Which software or system is affected?",
-                    'environment': "Where are you experiencing this issue (Production, Test/UAT, or Local)?",
-                    'issue_category': "What category best describes this issue?",
-                    'impact': "How much are you blocked (completely, partially, or just slow)?",
-                }
-                reply = question_map.get(next_field, f"Tell me more about {next_field}")
+            if missing:
+                next_field = missing[0]
+                reply = NEXT_QUESTION_TEMPLATES[next_field]
+                session.last_prompted_field = next_field
+        
+        _remember_reply(cache_key, reply)
+        cache = await get_cache()
+        await cache.set(cache_key, reply, ttl=get_ttl("llm_reply"))
     
     except Exception as e:
         logger.error(f"LLM error: {e}")
         reply = "Sorry, something went wrong. Please try again."
     
     # Store conversation history
-    conversation_state[chat_id] = (
-        history
-        + [{"role": "user", "content": user_text}]
-        + [{"role": "assistant", "content": reply}]
-    )[-10:]
+    await _store_history(chat_id, history, user_text, reply)
     
     return reply
 
 
+async def process_attachment(file_paths: list[str], chat_id: int, session) -> None:
+    """
+    Run the vision pipeline (analysis, then field extraction) for images.
+    
+    Images are sent VISION_MAX_IMAGES per vision call. Vision calls are
+    bounded by vision_semaphore; parsing the fields out of the analysis
+    happens outside it.
+    
+    Args:
+        file_paths: Local image paths (one upload or an album)
+        chat_id: Telegram chat ID
+        session: User session object
+    """
+    for start in range(0, len(file_paths), VISION_MAX_IMAGES):
+        # The analysis only fills empty fields - nothing to gain once all are set
+        if all(getattr(session, name) for name in VISION_FIELDS):
+            logger.info(f"[{chat_id}] Vision: all fields already set, skipping analysis")
+            return
+        
+        async with vision_semaphore:
+            analysis = await analyze_image_with_vision(file_paths[start:start + VISION_MAX_IMAGES], chat_id)
+        if analysis:
+            await extract_info_from_image_analysis(chat_id, analysis, session)
+
+
 async def process_file_with_text(chat_id: int, file_path: str, file_name: str, text: str, session) -> None:
     """
     Process file attachment along with text message.
@@ -883,137 +1333,343 @@ async def process_file_with_text(chat_id: int, file_path: str, file_name: str, t
     file_ext = os.path.splitext(file_name)[1].lower()
     
     # Analyze image with vision if it's an image
-    if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
-        analysis = await analyze_image_with_vision(file_path, chat_id)
-        if analysis:
-            await extract_info_from_image_analysis(chat_id, analysis, session)
+    if file_ext in IMAGE_MIME_TYPES:
+        await process_attachment([file_path], chat_id, session)
     
     # Also extract from the text if provided
     if text and text.strip():
         await try_extract_field(chat_id, text, session)
 
 
-# ==================== TELEGRAM WEBHOOK ====================
+# ==================== MESSAGE DEBOUNCE ====================
 
-@app.post("/telegram/webhook")
-async def telegram_webhook(req: Request):
+def _parse_debounce_ms(raw: str | None) -> float | None:
+    """Parse TG_DEBOUNCE_MS into seconds, or None for the adaptive delay."""
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        return None
+    return value / 1000 if math.isfinite(value) and value >= 0 else None
+
+
+DEBOUNCE_SECONDS = _parse_debounce_ms(TELEGRAM_DEBOUNCE_MS)
+SHORT_MESSAGE_CHARS = 80
+SHORT_MESSAGE_DEBOUNCE = 0.18  # Short messages usually come in bursts
+LONG_MESSAGE_DEBOUNCE = 0.3
+
+# Text waiting to be answered, the session's filled_mask from before the
+# first buffered message was extracted, and the pending flush, per chat
+_pending_text: dict[int, list[str]] = {}
+_pending_filled_before: dict[int, int] = {}
+_flush_tasks: dict[int, asyncio.Task] = {}
+
+
+def _debounce_delay(text: str) -> float:
+    """Seconds to wait for a follow-up message after text."""
+    if DEBOUNCE_SECONDS is not None:
+        return DEBOUNCE_SECONDS
+    return SHORT_MESSAGE_DEBOUNCE if len(text) <= SHORT_MESSAGE_CHARS else LONG_MESSAGE_DEBOUNCE
+
+
+async def queue_user_text(chat_id: int, text: str, session) -> None:
     """
-    Handle incoming Telegram webhook.
+    Buffer a text message and (re)start the chat's debounce timer.
     
-    Processes messages, files, and commands from Telegram bot.
+    Fields are still extracted per message, so coalescing a burst loses
+    nothing; only the LLM reply waits for the burst to end.
+    
+    Args:
+        chat_id: Telegram chat ID
+        text: User message
+        session: User session object
     """
+    _pending_filled_before.setdefault(chat_id, session.filled_mask)
+    await try_extract_field(chat_id, text, session)
+    
+    _pending_text.setdefault(chat_id, []).append(text)
+    task = _flush_tasks.get(chat_id)
+    if task:
+        task.cancel()
+    # Fresh context: the flush must not inherit this request's pinned session
+    _flush_tasks[chat_id] = asyncio.create_task(
+        _flush_after(chat_id, _debounce_delay(text)), context=contextvars.Context()
+    )
+
+
+async def _flush_after(chat_id: int, delay: float) -> None:
+    """Answer a chat's buffered messages with one LLM call after delay."""
+    await asyncio.sleep(delay)
+    
+    # Detach before the LLM call so a new message starts a new flush
+    # instead of cancelling this one
+    _flush_tasks.pop(chat_id, None)
+    text = "\n".join(_pending_text.pop(chat_id, []))
+    filled_before = _pending_filled_before.pop(chat_id, None)
+    if not text:
+        return
+    
     try:
-        data = await req.json()
+        async with _chat_lock(chat_id):
+            with session_scope(chat_id) as session:
+                reply = await run_llm(
+                    chat_id, text, session, extract=False, filled_before=filled_before
+                )
+        await send_message(chat_id, reply)
     except Exception as e:
-        logger.error(f"Failed to parse webhook: {e}")
-        return {"ok": False}
-    
-    msg = data.get("message")
-    if not msg:
-        return {"ok": True}
-    
-    chat_id = msg["chat"]["id"]
+        logger.error(f"[{chat_id}] Failed to answer buffered messages: {e}")
+
+
+def _discard_pending_text(chat_id: int) -> None:
+    """Drop a chat's buffered messages and cancel its pending flush."""
+    _pending_text.pop(chat_id, None)
+    _pending_filled_before.pop(chat_id, None)
+    task = _flush_tasks.pop(chat_id, None)
+    if task:
+        task.cancel()
+
+
+# ==================== MEDIA GROUPS ====================
+
+# Telegram delivers an album as one update per photo, a few ms apart;
+# buffer them so the album gets one vision pass and one reply
+MEDIA_GROUP_WINDOW = 0.2
+_media_groups: dict[str, tuple[list[str], list[str]]] = {}
+_media_group_tasks: dict[str, asyncio.Task] = {}
+
+
+def queue_media_group_photo(chat_id: int, media_group_id: str, path: str, caption: str) -> None:
+    """
+    Buffer a downloaded album photo and restart the album's flush timer.
     
-    try:
-        session = get_or_create_session(chat_id)
-        
-        # Get text if present
-        text = msg.get("text", "").strip() if "text" in msg else ""
-        caption = msg.get("caption", "").strip() if "caption" in msg else ""
-        user_input = text or caption
+    Args:
+        chat_id: Telegram chat ID
+        media_group_id: Telegram album ID
+        path: Local image path
+        caption: Photo caption (usually only on the album's first photo)
+    """
+    paths, captions = _media_groups.setdefault(media_group_id, ([], []))
+    paths.append(path)
+    if caption:
+        captions.append(caption)
+    
+    task = _media_group_tasks.get(media_group_id)
+    if task:
+        task.cancel()
+    # Fresh context: the flush must not inherit this request's pinned session
+    _media_group_tasks[media_group_id] = asyncio.create_task(
+        _flush_media_group(chat_id, media_group_id), context=contextvars.Context()
+    )
+
+
+async def _flush_media_group(chat_id: int, media_group_id: str) -> None:
+    """Analyze a buffered album together and reply once."""
+    await asyncio.sleep(MEDIA_GROUP_WINDOW)
+    
+    # Wait out the chat's in-flight updates (the album's next photo may be
+    # downloading), then detach - later photos start a new flush
+    async with _chat_lock(chat_id):
+        _media_group_tasks.pop(media_group_id, None)
+        paths, captions = _media_groups.pop(media_group_id, ([], []))
+        if not paths:
+            return
         
-        # File upload (document)
-        if "document" in msg:
-            file_name = msg["document"].get("file_name", "document")
-            path = await download_file(msg["document"]["file_id"], file_name, max_size=MAX_IMAGE_SIZE)
-            if path:
-                session.attachments.append(path)
-                await process_file_with_text(chat_id, path, file_name, user_input, session)
+        try:
+            with session_scope(chat_id) as session:
+                await process_attachment(paths, chat_id, session)
                 
-                if user_input:
-                    reply = await run_llm(chat_id, user_input)
-                    send_message(chat_id, reply)
+                text = "\n".join(captions)
+                if text:
+                    filled_before = session.filled_mask
+                    await try_extract_field(chat_id, text, session)
+                    reply = await run_llm(
+                        chat_id, text, session, extract=False, filled_before=filled_before
+                    )
                 else:
-                    send_message(chat_id, "📎 Got the file. Please continue.")
-            else:
-                send_message(chat_id, "❌ Failed to download file. File may be too large (max 5MB).")
-            return {"ok": True}
+                    reply = f"📸 Got {len(paths)} screenshots. Please continue."
+            await send_message(chat_id, reply)
+        except Exception as e:
+            logger.error(f"[{chat_id}] Failed to process album {media_group_id}: {e}")
+
+
+# ==================== TELEGRAM WEBHOOK ====================
+
+async def handle_telegram_message(chat_id: int, msg: dict, session) -> dict:
+    """
+    Process a single Telegram message for a chat.
+    
+    Args:
+        chat_id: Telegram chat ID
+        msg: Telegram message payload
+        session: User session object
         
-        # Photo upload
-        if "photo" in msg:
-            photo = msg["photo"][-1]
-            path = await download_file(photo["file_id"], f"screenshot_{chat_id}_{len(session.attachments)}.jpg", max_size=MAX_IMAGE_SIZE)
-            if path:
-                session.attachments.append(path)
-                await process_file_with_text(chat_id, path, f"screenshot.jpg", user_input, session)
-                
-                if user_input:
-                    reply = await run_llm(chat_id, user_input)
-                    send_message(chat_id, reply)
-                else:
-                    send_message(chat_id, "📸 Got the screenshot. Please continue.")
+    Returns:
+        Webhook response payload
+    """
+    # Get text if present
+    text = msg.get("text", "").strip() if "text" in msg else ""
+    caption = msg.get("caption", "").strip() if "caption" in msg else ""
+    user_input = text or caption
+    
+    # File upload (document)
+    if "document" in msg:
+        file_name = msg["document"].get("file_name", "document")
+        path = await download_file(msg["document"]["file_id"], file_name, max_size=MAX_IMAGE_SIZE)
+        if path:
+            session.attachments.append(path)
+            filled_before = session.filled_mask
+            await process_file_with_text(chat_id, path, file_name, user_input, session)
+            
+            if user_input:
+                reply = await run_llm(
+                    chat_id, user_input, session, extract=False, filled_before=filled_before
+                )
+                await send_message(chat_id, reply)
             else:
-                send_message(chat_id, "❌ Failed to download screenshot. File may be too large (max 5MB).")
-            return {"ok": True}
-        
-        # Video upload
-        if "video" in msg:
-            video = msg["video"]
-            video_name = f"video_{chat_id}_{len(session.attachments)}.mp4"
-            path = await download_file(video["file_id"], video_name, max_size=MAX_VIDEO_SIZE)
-            if path:
-                session.attachments.append(path)
-                if user_input:
-                    await try_extract_field(chat_id, user_input, session)
-                
-                if user_input:
-                    reply = await run_llm(chat_id, user_input)
-                    send_message(chat_id, reply)
-                else:
-                    send_message(chat_id, "🎥 Got the video. Please continue.")
+                await send_message(chat_id, "📎 Got the file. Please continue.")
+        else:
+            await send_message(chat_id, "❌ Failed to download file. File may be too large (max 5MB).")
+        return {"ok": True}
+    
+    # Photo upload
+    if "photo" in msg:
+        photo = msg["photo"][-1]
+        path = await download_file(photo["file_id"], f"screenshot_{chat_id}_{len(session.attachments)}.jpg", max_size=MAX_IMAGE_SIZE)
+        if path and msg.get("media_group_id"):
+            session.attachments.append(path)
+            queue_media_group_photo(chat_id, msg["media_group_id"], path, user_input)
+        elif path:
+            session.attachments.append(path)
+            filled_before = session.filled_mask
+            await process_file_with_text(chat_id, path, "screenshot.jpg", user_input, session)
+            
+            if user_input:
+                reply = await run_llm(
+                    chat_id, user_input, session, extract=False, filled_before=filled_before
+                )
+                await send_message(chat_id, reply)
             else:
-                send_message(chat_id, "❌ Failed to download video. File may be too large (max 20MB).")
+                await send_message(chat_id, "📸 Got the screenshot. Please continue.")
+        else:
+            await send_message(chat_id, "❌ Failed to download screenshot. File may be too large (max 5MB).")
+        return {"ok": True}
+    
+    # Video upload
+    if "video" in msg:
+        video = msg["video"]
+        video_name = f"video_{chat_id}_{len(session.attachments)}.mp4"
+        path = await download_file(video["file_id"], video_name, max_size=MAX_VIDEO_SIZE)
+        if path:
+            session.attachments.append(path)
+            if user_input:
+                reply = await run_llm(chat_id, user_input, session)
+                await send_message(chat_id, reply)
+            else:
+                await send_message(chat_id, "🎥 Got the video. Please continue.")
+        else:
+            await send_message(chat_id, "❌ Failed to download video. File may be too large (max 20MB).")
+        return {"ok": True}
+    
+    if user_input:
+        command = user_input.lower()
+        
+        # Special commands
+        if command in ["/start", "/help"]:
+            greeting = (
+                "Hi! I'm Gatekeeper, your support intake assistant.\n\n"
+                "I'll help you create a support ticket by asking a few quick questions.\n"
+                "You can also upload screenshots or videos to help explain your issue.\n"
+                "Use /edit <ticket_id> to modify an existing ticket.\n"
+                "Please describe your issue, and I'll guide you from there."
+            )
+            await send_message(chat_id, greeting)
             return {"ok": True}
         
-        if user_input:
-            # Special commands
-            if user_input.lower() in ["/start", "/help"]:
-                greeting = (
-                    "Hi! I'm Gatekeeper, your support intake assistant.\n\n"
-                    "I'll help you create a support ticket by asking a few quick questions.\n"
-                    "You can also upload screenshots or videos to help explain your issue.\n"
-                    "Use /edit <ticket_id> to modify an existing ticket.\n"
-                    "Please describe your issue, and I'll guide you from there."
-                )
-                send_message(chat_id, greeting)
-                return {"ok": True}
-            
-            if user_input.lower().startswith("/edit "):
-                ticket_id = user_input[6:].strip().upper()
-                if not ticket_id:
-                    send_message(chat_id, "Usage: /edit <ticket_id>")
-                    return {"ok": True}
-                
-                # Show ticket for editing
-                send_message(chat_id, f"Edit feature coming in Phase 2 - editing ticket {ticket_id}")
+        if command.startswith("/edit "):
+            ticket_id = user_input[6:].strip().upper()
+            if not ticket_id:
+                await send_message(chat_id, "Usage: /edit <ticket_id>")
                 return {"ok": True}
             
-            if user_input.lower() == "/cancel":
-                clear_session(chat_id)
-                conversation_state.pop(chat_id, None)
-                send_message(chat_id, "Support request cancelled. Type /start to begin again.")
-                return {"ok": True}
-            
-            # Regular message processing
-            reply = await run_llm(chat_id, user_input)
-            send_message(chat_id, reply)
+            # Show ticket for editing
+            await send_message(chat_id, f"Edit feature coming in Phase 2 - editing ticket {ticket_id}")
+            return {"ok": True}
         
-        return {"ok": True}
+        if command == "/cancel":
+            _discard_pending_text(chat_id)
+            clear_session(chat_id)
+            await _forget_history(chat_id)
+            await send_message(chat_id, "Support request cancelled. Type /start to begin again.")
+            return {"ok": True}
+        
+        # Regular message processing (bursts are answered once)
+        await queue_user_text(chat_id, user_input, session)
     
+    return {"ok": True}
+
+
+@app.post("/telegram/webhook")
+async def telegram_webhook(req: Request):
+    """
+    Handle incoming Telegram webhook.
+    
+    Processes messages, files, and commands from Telegram bot.
+    """
+    try:
+        data = json_loads(await req.body())
     except Exception as e:
-        logger.error(f"Webhook error: {e}")
-        send_message(chat_id, "Sorry, something went wrong. Please try again.")
+        logger.error(f"Failed to parse webhook: {e}")
         return {"ok": False}
+    
+    msg = data.get("message")
+    if not msg:
+        return {"ok": True}
+    
+    update_id = data.get("update_id")
+    if update_id is not None:
+        if update_id in _seen_updates:
+            logger.info(f"Skipping redelivered update {update_id}")
+            return {"ok": True}
+        _seen_updates[update_id] = None
+        if len(_seen_updates) > MAX_SEEN_UPDATES:
+            _seen_updates.popitem(last=False)
+    
+    chat_id = msg["chat"]["id"]
+    
+    # Ack right away - Telegram retries slow webhooks. Fresh context so the
+    # task doesn't inherit anything request-scoped
+    task = asyncio.create_task(process_update(chat_id, msg), context=contextvars.Context())
+    update_tasks.add(task)
+    task.add_done_callback(update_tasks.discard)
+    return {"ok": True}
+
+
+def _chat_lock(chat_id: int) -> asyncio.Lock:
+    """Get the lock serializing a chat's updates, creating it if needed."""
+    lock = _chat_locks.get(chat_id)
+    if lock is None:
+        lock = _chat_locks[chat_id] = asyncio.Lock()
+    return lock
+
+
+async def process_update(chat_id: int, msg: dict) -> None:
+    """
+    Process a Telegram update in the background.
+    
+    Updates for the same chat run one at a time, in arrival order; waiting
+    on the chat lock doesn't hold an update_semaphore slot.
+    
+    Args:
+        chat_id: Telegram chat ID
+        msg: Telegram message payload
+    """
+    async with _chat_lock(chat_id), update_semaphore:
+        try:
+            with session_scope(chat_id) as session:
+                await handle_telegram_message(chat_id, msg, session)
+        
+        except Exception as e:
+            logger.error(f"Webhook error: {e}")
+            await send_message(chat_id, "Sorry, something went wrong. Please try again.")
 
 # ==================== STARTUP/SHUTDOWN ====================
 
@@ -1025,6 +1681,8 @@ async def startup_event():
     # Initialize database
     init_db()
     
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    
     # Initialize cache
     try:
         await init_cache()
@@ -1032,6 +1690,9 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"Cache initialization failed, continuing without cache: {e}")
     
+    global telegram_sender_task
+    telegram_sender_task = asyncio.create_task(telegram_sender())
+    
     logger.info("✓ Gatekeeper started successfully")
 
 
@@ -1040,11 +1701,33 @@ async def shutdown_event():
     """Clean up resources on shutdown"""
     logger.info("Shutting down Gatekeeper...")
     
+    if update_tasks:
+        # Let in-flight updates finish so their replies get queued
+        await asyncio.wait(update_tasks, timeout=10)
+    
+    # Debounced replies and albums the updates left behind
+    pending = [*_flush_tasks.values(), *_media_group_tasks.values()]
+    if pending:
+        await asyncio.wait(pending, timeout=5)
+    
+    if telegram_sender_task is not None:
+        # Give queued replies a moment to go out
+        try:
+            await asyncio.wait_for(telegram_outbox.join(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {telegram_outbox.qsize()} unsent Telegram messages")
+        telegram_sender_task.cancel()
+    
+    # Close the cache last - updates and flushes load and store history
+    # through it, and get_cache() would quietly open a new client
     try:
         await close_cache()
     except Exception as e:
         logger.error(f"Error closing cache: {e}")
     
+    await telegram_http.aclose()
+    await groq_async_client.close()
+    
     logger.info("✓ Gatekeeper shut down")
 
 
@@ -8,8 +8,10 @@ Endpoints:
 - POST /api/chat/feedback - Record search feedback for adaptive thresholds
 """
 
+import asyncio
 import logging
 import json
+import re
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 from uuid import UUID
@@ -23,6 +25,7 @@ from core.database import (
     get_db, ChatSession, User, Company, Ticket, ChatAttachment, TicketEvent
 )
 from core.config import TELEGRAM_BOT_TOKEN, TELEGRAM_API
+from core.http_client import DOWNLOAD_CHUNK_SIZE, telegram_http
 from middleware.cache_decorator import cache_endpoint, invalidate_on_mutation
 from services.chat_ticket_service import ChatTicketService
 from services.chat_search_service import ChatSearchService
@@ -38,6 +41,16 @@ router = APIRouter(prefix="/api/chat", tags=["chat"])
 chat_ticket_service = ChatTicketService()
 chat_search_service = ChatSearchService()
 
+# Reply keywords for the resolution prompts, each list compiled into one
+# alternation (matches anywhere in the reply, like a substring check)
+def _keyword_re(words: tuple) -> re.Pattern:
+    return re.compile("|".join(map(re.escape, words)))
+
+SIMILAR_DECLINE_RE = _keyword_re(('no', 'nope', 'nah', 'false', 'create new', 'skip', 'none', 'different', 'other'))
+SIMILAR_CONFIRM_RE = _keyword_re(('yes', 'y', 'confirmed', 'works', 'solved', 'perfect', 'thanks', 'that\'s it'))
+DETAILS_CONFIRM_RE = _keyword_re(('yes', 'y', 'works', 'solved', 'thanks', 'perfect'))
+DETAILS_DECLINE_RE = _keyword_re(('no', 'doesn\'t work', 'more help', 'create new'))
+
 
 @router.post("/webhook")
 @invalidate_on_mutation(tags=["chat:sessions", "ticket:list"])
@@ -190,8 +203,7 @@ async def _handle_text_message(
             logger.info(f"Retrieved {len(similar_tickets)} cached tickets")
             
             # Check for decline (no / create new / etc.)
-            decline_words = ['no', 'nope', 'nah', 'false', 'create new', 'skip', 'none', 'different', 'other']
-            if any(word in response_lower for word in decline_words):
+            if SIMILAR_DECLINE_RE.search(response_lower):
                 logger.info("User declined similar tickets, creating new ticket with inferred category")
                 
                 # Get inferred category from pending analysis
@@ -268,8 +280,7 @@ async def _handle_text_message(
                     return f"Please select a valid ticket number (1-{len(similar_tickets)})"
             
             # Check for confirmation (yes)
-            confirmation_words = ['yes', 'y', 'confirmed', 'works', 'solved', 'perfect', 'thanks', 'that\'s it']
-            if any(word in response_lower for word in confirmation_words):
+            if SIMILAR_CONFIRM_RE.search(response_lower):
                 logger.info("User confirmed issue is resolved")
                 
                 # Clear all states
@@ -307,8 +318,7 @@ async def _handle_text_message(
             response_lower = text.lower().strip()
             
             # Check for confirmation
-            confirmation_words = ['yes', 'y', 'works', 'solved', 'thanks', 'perfect']
-            if any(word in response_lower for word in confirmation_words):
+            if DETAILS_CONFIRM_RE.search(response_lower):
                 logger.info("User confirmed ticket resolved their issue")
                 
                 # Clear all states
@@ -325,8 +335,7 @@ async def _handle_text_message(
                 )
             
             # Check for decline
-            decline_words = ['no', 'doesn\'t work', 'more help', 'create new']
-            if any(word in response_lower for word in decline_words):
+            if DETAILS_DECLINE_RE.search(response_lower):
                 logger.info("User needs different solution")
                 
                 # Retrieve cached tickets
@@ -474,7 +483,8 @@ async def _handle_text_message(
         if len(text) >= 20:
             logger.info(f"Long message ({len(text)} chars): analyzing...")
             try:
-                analysis = chat_ticket_service.analyze_issue_for_chat(
+                analysis = await asyncio.to_thread(
+                    chat_ticket_service.analyze_issue_for_chat,
                     chat_session_id=chat_session.id,
                     issue_description=text
                 )
@@ -679,7 +689,8 @@ async def _handle_photo_message(
             try:
                 issue_description = f"{caption}\n[Photo attached]"
                 
-                analysis = chat_ticket_service.analyze_issue_for_chat(
+                analysis = await asyncio.to_thread(
+                    chat_ticket_service.analyze_issue_for_chat,
                     chat_session_id=chat_session.id,
                     issue_description=issue_description,
                     image_path=file_path
@@ -850,7 +861,8 @@ async def _handle_document_message(
             try:
                 issue_description = f"{caption}\n[Document: {file_name}]"
                 
-                analysis = chat_ticket_service.analyze_issue_for_chat(
+                analysis = await asyncio.to_thread(
+                    chat_ticket_service.analyze_issue_for_chat,
                     chat_session_id=chat_session.id,
                     issue_description=issue_description,
                     image_path=file_path
@@ -1314,23 +1326,20 @@ async def _send_telegram_message(chat_id: int, text: str) -> bool:
             logger.warning("TELEGRAM_API not configured")
             return False
         
-        import httpx
+        response = await telegram_http.post(
+            f"{TELEGRAM_API}/sendMessage",
+            json={
+                "chat_id": chat_id,
+                "text": text,
+            },
+            timeout=10.0
+        )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{TELEGRAM_API}/sendMessage",
-                json={
-                    "chat_id": chat_id,
-                    "text": text,
-                },
-                timeout=10.0
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to send Telegram message: {response.text}")
-                return False
-            
-            return True
+        if response.status_code != 200:
+            logger.error(f"Failed to send Telegram message: {response.text}")
+            return False
+        
+        return True
     
     except Exception as e:
         logger.error(f"Error sending Telegram message: {e}")
@@ -1344,44 +1353,42 @@ async def _download_telegram_file(file_id: str) -> Optional[str]:
         if not TELEGRAM_API or not TELEGRAM_BOT_TOKEN:
             return None
         
-        import httpx
         import os
         
         # Get file info
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{TELEGRAM_API}/getFile",
-                params={"file_id": file_id},
-                timeout=10.0
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to get file info: {response.text}")
-                return None
-            
-            file_info = response.json().get("result", {})
-            file_path = file_info.get("file_path")
-            
-            if not file_path:
-                return None
-            
-            # Download file
-            file_url = f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}"
-            
-            file_response = await client.get(file_url, timeout=10.0)
+        response = await telegram_http.get(
+            f"{TELEGRAM_API}/getFile",
+            params={"file_id": file_id},
+            timeout=10.0
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Failed to get file info: {response.text}")
+            return None
+        
+        file_info = response.json().get("result", {})
+        file_path = file_info.get("file_path")
+        
+        if not file_path:
+            return None
+        
+        # Download file, streamed to disk
+        file_url = f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}"
+        local_path = f"uploads/chat/{file_id}.jpg"
+        os.makedirs("uploads/chat", exist_ok=True)
+        
+        async with telegram_http.stream("GET", file_url, timeout=10.0) as file_response:
             if file_response.status_code != 200:
+                await file_response.aread()
                 logger.error(f"Failed to download file: {file_response.text}")
                 return None
             
-            # Save locally
-            local_path = f"uploads/chat/{file_id}.jpg"
-            os.makedirs("uploads/chat", exist_ok=True)
-            
             with open(local_path, "wb") as f:
-                f.write(file_response.content)
-            
-            logger.info(f"Downloaded file to {local_path}")
-            return local_path
+                async for chunk in file_response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        
+        logger.info(f"Downloaded file to {local_path}")
+        return local_path
     
     except Exception as e:
         logger.error(f"Error downloading Telegram file: {e}")
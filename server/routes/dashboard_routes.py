@@ -110,12 +110,12 @@ async def assign_ticket(
 
 
 @router.get("/analytics")
-@cache_endpoint(ttl=300, tag="analytics", key_params=["company_id", "period"])
+@cache_endpoint(ttl=300, tag="analytics", key_params=["days"])
 async def get_analytics(
     days: int = Query(30, ge=1, le=365),
     admin_payload: dict = Depends(get_current_admin)
 ):
-    """Get ticket details with caching"""
+    """Get ticket analytics with caching"""
     try:
         analytics = TicketService.get_analytics(days=days)
         return analytics
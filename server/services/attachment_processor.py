@@ -40,6 +40,8 @@ from uuid import UUID
 from pathlib import Path
 from io import BytesIO
 
+from sqlalchemy import select
+
 from core.database import SessionLocal, Attachment, Embedding
 from core.config import GROQ_API_KEY
 from core.logger import get_logger
@@ -542,39 +544,25 @@ class AttachmentProcessor:
         try:
             from .embedding_manager import EmbeddingManager
             
-            # Get all active embeddings for this attachment
-            embeddings = db.query(Embedding).filter(
-                Embedding.attachment_id == UUID(attachment_id),
-                Embedding.is_active == True
-            ).all()
+            deprecation_reason = reason or "attachment_deprecated"
             
-            if not embeddings:
+            # Mark the attachment's active embeddings inactive (one statement)
+            vector_ids = EmbeddingManager._deprecate_active_embeddings(
+                db,
+                deprecation_reason,
+                Embedding.attachment_id == UUID(attachment_id)
+            )
+            
+            if not vector_ids:
                 logger.debug(f"No active embeddings found for {attachment_id}")
                 return True
             
-            deprecation_reason = reason or "attachment_deprecated"
-            now = date.today()
-            
-            # Update PostgreSQL - mark as inactive
-            for emb in embeddings:
-                emb.is_active = False
-                emb.deprecated_at = now
-                emb.deprecation_reason = deprecation_reason
-            
             db.commit()
             
-            # Delete from Qdrant for each embedding
-            qdrant_deleted = 0
-            for emb in embeddings:
-                if emb.vector_id:
-                    success = EmbeddingManager._delete_qdrant_embedding(
-                        embedding_id=str(emb.id),
-                        vector_id=emb.vector_id
-                    )
-                    if success:
-                        qdrant_deleted += 1
+            # Qdrant cleanup runs in the background once the commit is done
+            qdrant_queued = EmbeddingManager._delete_qdrant_embeddings_later(vector_ids)
             
-            logger.info(f"✓ Deprecated {len(embeddings)} embeddings ({qdrant_deleted} deleted from Qdrant, reason: {deprecation_reason})")
+            logger.info(f"✓ Deprecated {len(vector_ids)} embeddings ({qdrant_queued} queued for Qdrant deletion, reason: {deprecation_reason})")
             return True
             
         except Exception as e:
@@ -594,46 +582,22 @@ class AttachmentProcessor:
             from core.database import RCAAttachment
             from .embedding_manager import EmbeddingManager
             
-            # Get all RCA attachments
-            rca_attachments = db.query(RCAAttachment).filter(
-                RCAAttachment.rca_id == UUID(rca_id)
-            ).all()
-            
-            if not rca_attachments:
-                logger.debug(f"No RCA attachments found for {rca_id}")
-                return True
+            # Mark the active embeddings of all the RCA's attachments inactive
+            # in one statement, instead of a query per attachment
+            vector_ids = EmbeddingManager._deprecate_active_embeddings(
+                db,
+                reason or "rca_attachments_deprecated",
+                Embedding.rca_attachment_id.in_(
+                    select(RCAAttachment.id).where(RCAAttachment.rca_id == UUID(rca_id))
+                )
+            )
             
-            deprecation_reason = reason or "rca_attachments_deprecated"
-            now = date.today()
-            total_deprecated = 0
-            qdrant_deleted = 0
+            db.commit()
             
-            # For each RCA attachment, deprecate its embeddings
-            for rca_att in rca_attachments:
-                embeddings = db.query(Embedding).filter(
-                    Embedding.rca_attachment_id == rca_att.id,
-                    Embedding.is_active == True
-                ).all()
-                
-                # Update PostgreSQL - mark as inactive
-                for emb in embeddings:
-                    emb.is_active = False
-                    emb.deprecated_at = now
-                    emb.deprecation_reason = deprecation_reason
-                    total_deprecated += 1
-                
-                # Delete from Qdrant for each embedding
-                for emb in embeddings:
-                    if emb.vector_id:
-                        success = EmbeddingManager._delete_qdrant_embedding(
-                            embedding_id=str(emb.id),
-                            vector_id=emb.vector_id
-                        )
-                        if success:
-                            qdrant_deleted += 1
+            # Qdrant cleanup runs in the background once the commit is done
+            qdrant_queued = EmbeddingManager._delete_qdrant_embeddings_later(vector_ids)
             
-            db.commit()
-            logger.info(f"✓ Deprecated {total_deprecated} RCA attachment embeddings ({qdrant_deleted} deleted from Qdrant)")
+            logger.info(f"✓ Deprecated {len(vector_ids)} RCA attachment embeddings ({qdrant_queued} queued for Qdrant deletion)")
             return True
             
         except Exception as e:
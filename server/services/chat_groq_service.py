@@ -28,6 +28,9 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Checked in order by _detect_issue - the first one present is reported
+ERROR_KEYWORDS = ("error", "failed", "issue", "problem", "crash", "bug", "exception", "warning")
+
 
 class ChatGroqService:
     """Service for intent extraction and vision analysis via Groq"""
@@ -242,16 +245,16 @@ Respond ONLY with valid JSON (no markdown, no code blocks):
     @staticmethod
     def _extract_text_content(text: str) -> Optional[str]:
         """Extract any readable text from image analysis"""
-        if "text" in text.lower() or "says" in text.lower() or "shows" in text.lower():
+        text_lower = text.lower()
+        if "text" in text_lower or "says" in text_lower or "shows" in text_lower:
             return text
         return None
     
     @staticmethod
     def _detect_issue(text: str) -> Optional[str]:
         """Detect if analysis mentions an error or issue"""
-        error_keywords = ["error", "failed", "issue", "problem", "crash", "bug", "exception", "warning"]
         text_lower = text.lower()
-        for keyword in error_keywords:
+        for keyword in ERROR_KEYWORDS:
             if keyword in text_lower:
                 return f"Potential issue detected: {keyword}"
         return None
\ No newline at end of file
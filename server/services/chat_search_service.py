@@ -109,34 +109,53 @@ class ChatSearchService:
                 with_payload=True
             )
             
-            results = []
+            # Best hit per ticket above the threshold, in score order
+            hits = []
             seen_tickets = set()
             
             for scored_point in search_result:
-                payload = scored_point.payload
-                similarity = scored_point.score
-                
                 # Filter by minimum similarity threshold
-                if similarity < min_similarity:
+                if scored_point.score < min_similarity:
                     continue
                 
-                ticket_id = UUID(payload.get("ticket_id"))
+                ticket_id = UUID(scored_point.payload.get("ticket_id"))
                 
                 # Avoid duplicate tickets in results
                 if ticket_id in seen_tickets:
                     continue
                 
                 seen_tickets.add(ticket_id)
+                hits.append((ticket_id, scored_point))
+            
+            if not hits:
+                logger.info(f"Found 0 solutions for company {company.name}")
+                return []
+            
+            # Load ticket details and RCAs for all hits in one query each
+            # instead of two round trips per hit
+            ticket_ids = [ticket_id for ticket_id, _ in hits]
+            tickets = {
+                ticket.id: ticket
+                for ticket in db.query(Ticket).filter(Ticket.id.in_(ticket_ids)).all()
+            }
+            rcas = {
+                rca.ticket_id: rca
+                for rca in db.query(RootCauseAnalysis).filter(
+                    RootCauseAnalysis.ticket_id.in_(ticket_ids)
+                ).all()
+            }
+            
+            results = []
+            
+            for ticket_id, scored_point in hits:
+                payload = scored_point.payload
+                similarity = scored_point.score
                 
-                # Get ticket details from database
-                ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+                ticket = tickets.get(ticket_id)
                 if not ticket:
                     continue
                 
-                # Get RCA if available
-                rca = db.query(RootCauseAnalysis).filter(
-                    RootCauseAnalysis.ticket_id == ticket_id
-                ).first()
+                rca = rcas.get(ticket_id)
                 
                 result = {
                     "ticket_id": str(ticket_id),
@@ -14,11 +14,15 @@ This service:
 
 import logging
 import base64
+import threading
+from collections import Counter
 from typing import Dict, Any, Optional
 from uuid import UUID
 from datetime import date, datetime
 
-from core.database import SessionLocal, User, Company, Ticket, ChatSession
+from sqlalchemy import func
+
+from core.database import SessionLocal, ReadSessionLocal, User, Company, Ticket, ChatSession
 from utils.datetime_utils import to_iso_date
 from .ticket_creation_service import TicketCreationService
 from .chat_search_service import ChatSearchService
@@ -34,6 +38,9 @@ class ChatTicketService:
     # Cache for adaptive thresholds (refresh periodically)
     _threshold_cache = {}
     _threshold_cache_time = {}
+    _threshold_locks = {}
+    _threshold_refreshing = set()
+    _threshold_locks_guard = threading.Lock()
     THRESHOLD_CACHE_TTL = 3600  # 1 hour
     
     def __init__(self):
@@ -338,52 +345,90 @@ class ChatTicketService:
         Returns threshold value (0.0-1.0) that adapts based on actual performance.
         """
         
-        company_id_str = str(company_id)
-        now = datetime.utcnow().timestamp()
-        
-        # Check if we have cached thresholds for this company
-        if company_id_str in self._threshold_cache:
-            cache_time = self._threshold_cache_time.get(company_id_str, 0)
-            if now - cache_time < self.THRESHOLD_CACHE_TTL:
-                thresholds = self._threshold_cache[company_id_str]
-                category_key = category or "other"
-                threshold = thresholds.get(category_key.lower(), 0.55)
-                
-                # Lower threshold if image was provided (more context = better matching)
-                if has_image:
-                    threshold = max(0.45, threshold - 0.05)
-                
-                return threshold
-        
-        # Calculate adaptive thresholds from actual search feedback
         try:
-            thresholds = self._calculate_thresholds_from_feedback(company_id)
-            
-            # Cache the thresholds
-            self._threshold_cache[company_id_str] = thresholds
-            self._threshold_cache_time[company_id_str] = now
-            
-            logger.info(f"Calculated adaptive thresholds for company {company_id_str}: {thresholds}")
-            
-            category_key = category or "other"
-            threshold = thresholds.get(category_key.lower(), 0.55)
-            
-            # Lower threshold if image was provided
-            if has_image:
-                threshold = max(0.45, threshold - 0.05)
-            
-            return threshold
-        
+            thresholds = self._get_company_thresholds(company_id)
+            threshold = thresholds.get((category or "other").lower(), 0.55)
         except Exception as e:
             logger.warning(f"Failed to calculate adaptive thresholds: {e}, using defaults")
+            threshold = self._get_default_threshold(category)
         
-        # Fallback to sensible defaults
-        threshold = self._get_default_threshold(category)
+        # Lower threshold if image was provided (more context = better matching)
         if has_image:
             threshold = max(0.45, threshold - 0.05)
         
         return threshold
     
+    @classmethod
+    def _get_company_thresholds(cls, company_id: UUID, force: bool = False) -> Dict[str, float]:
+        """
+        Get a company's category thresholds, sampling Qdrant at most once per TTL.
+        
+        Entries past half their TTL are still served while a background thread
+        recomputes them, so searches rarely wait on the sampling. Concurrent
+        misses for one company compute once. Pass force=True to recompute inline.
+        """
+        company_id_str = str(company_id)
+        
+        if not force:
+            thresholds = cls._fresh_thresholds(company_id_str)
+            if thresholds is not None:
+                return thresholds
+        
+        with cls._threshold_lock(company_id_str):
+            # Another request may have filled the cache while we waited
+            if not force:
+                thresholds = cls._fresh_thresholds(company_id_str, refresh=False)
+                if thresholds is not None:
+                    return thresholds
+            
+            thresholds = cls._calculate_thresholds_from_feedback(company_id)
+            cls._threshold_cache[company_id_str] = thresholds
+            cls._threshold_cache_time[company_id_str] = datetime.utcnow().timestamp()
+        
+        logger.info(f"Calculated adaptive thresholds for company {company_id_str}: {thresholds}")
+        return thresholds
+    
+    @classmethod
+    def _fresh_thresholds(cls, company_id_str: str, refresh: bool = True) -> Optional[Dict[str, float]]:
+        """Cached thresholds if still within TTL, scheduling a refresh once half-aged"""
+        thresholds = cls._threshold_cache.get(company_id_str)
+        if thresholds is None:
+            return None
+        
+        age = datetime.utcnow().timestamp() - cls._threshold_cache_time.get(company_id_str, 0)
+        if age >= cls.THRESHOLD_CACHE_TTL:
+            return None
+        
+        if refresh and age >= cls.THRESHOLD_CACHE_TTL / 2:
+            cls._refresh_thresholds_async(company_id_str)
+        
+        return thresholds
+    
+    @classmethod
+    def _refresh_thresholds_async(cls, company_id_str: str) -> None:
+        """Recompute a company's thresholds in a background thread (one at a time)"""
+        with cls._threshold_locks_guard:
+            if company_id_str in cls._threshold_refreshing:
+                return
+            cls._threshold_refreshing.add(company_id_str)
+        
+        def refresh():
+            try:
+                cls._get_company_thresholds(UUID(company_id_str), force=True)
+            except Exception as e:
+                logger.warning(f"Background threshold refresh failed for {company_id_str}: {e}")
+            finally:
+                with cls._threshold_locks_guard:
+                    cls._threshold_refreshing.discard(company_id_str)
+        
+        threading.Thread(target=refresh, daemon=True, name="ThresholdRefresh").start()
+    
+    @classmethod
+    def _threshold_lock(cls, company_id_str: str) -> threading.Lock:
+        """Per-company lock so concurrent cache misses sample Qdrant once"""
+        with cls._threshold_locks_guard:
+            return cls._threshold_locks.setdefault(company_id_str, threading.Lock())
+    
     @staticmethod
     def _calculate_thresholds_from_feedback(company_id: UUID) -> Dict[str, float]:
         """
@@ -395,7 +440,7 @@ class ChatTicketService:
         - If solutions found at 0.50 score in category X → can use 0.50 threshold
         - If no results until 0.60 in category Y → needs 0.60 threshold
         """
-        db = SessionLocal()
+        db = ReadSessionLocal()
         try:
             from qdrant_client import QdrantClient
             from qdrant_client.models import Filter, FieldCondition, MatchValue
@@ -410,32 +455,45 @@ class ChatTicketService:
             )
             embedding_client = EmbeddingAPIClient()
             
-            # Get all tickets in company by category
-            company_tickets = db.query(Ticket).filter(
-                Ticket.company_id == company_id
-            ).all()
+            # Index each ticket's category so search hits can be classified
+            # without a query per hit - IDs and categories only, not full rows
+            category_expr = func.lower(func.coalesce(func.nullif(Ticket.category, ""), "other"))
+            category_by_id = {
+                str(ticket_id): cat
+                for ticket_id, cat in db.query(Ticket.id, category_expr).filter(
+                    Ticket.company_id == company_id
+                )
+            }
             
-            if not company_tickets:
+            if not category_by_id:
                 return ChatTicketService._get_default_thresholds()
             
-            # Group tickets by category
-            by_category = {}
-            for ticket in company_tickets:
-                cat = (ticket.category or "other").lower()
-                if cat not in by_category:
-                    by_category[cat] = []
-                by_category[cat].append(ticket)
+            ticket_counts = Counter(category_by_id.values())
+            
+            # Pick up to 3 sample tickets per category in SQL, so descriptions
+            # are only read for the tickets that get sampled
+            sample_rank = func.row_number().over(
+                partition_by=category_expr,
+                order_by=Ticket.created_at
+            ).label("sample_rank")
+            ranked = db.query(
+                Ticket.id,
+                Ticket.subject,
+                Ticket.detailed_description,
+                category_expr.label("category"),
+                sample_rank
+            ).filter(Ticket.company_id == company_id).subquery()
+            
+            samples_by_category = {}
+            for sample in db.query(ranked).filter(ranked.c.sample_rank <= 3):
+                samples_by_category.setdefault(sample.category, []).append(sample)
             
             thresholds = {}
             
             # For each category, analyze what similarity scores typically match
-            for cat, tickets in by_category.items():
-                if not tickets:
-                    thresholds[cat] = 0.55
-                    continue
-                
-                # Take sample tickets (up to 3) and check their search results
-                sample_tickets = tickets[:3]
+            for cat, ticket_count in ticket_counts.items():
+                # Check the sample tickets' search results
+                sample_tickets = samples_by_category.get(cat, [])
                 similarity_scores = []
                 
                 for sample_ticket in sample_tickets:
@@ -478,12 +536,8 @@ class ChatTicketService:
                             if ticket_id == str(sample_ticket.id):
                                 continue
                             
-                            result_ticket = db.query(Ticket).filter(
-                                Ticket.id == UUID(ticket_id)
-                            ).first()
-                            
                             # If result is in same category, record its score
-                            if result_ticket and (result_ticket.category or "other").lower() == cat:
+                            if category_by_id.get(ticket_id) == cat:
                                 similarity_scores.append(scored_point.score)
                     
                     except Exception as e:
@@ -502,7 +556,7 @@ class ChatTicketService:
                     threshold = max(0.45, optimal_score - 0.05)
                     
                     logger.info(
-                        f"Category '{cat}': {len(tickets)} tickets, {len(similarity_scores)} matches sampled, "
+                        f"Category '{cat}': {ticket_count} tickets, {len(similarity_scores)} matches sampled, "
                         f"25th percentile={optimal_score:.3f}, threshold={threshold:.3f}"
                     )
                 else:
@@ -510,15 +564,15 @@ class ChatTicketService:
                     # This is normal for new/sparse categories - use adaptive default
                     # If category has only 1 ticket: higher threshold (need more precision)
                     # If category has multiple tickets: lower threshold (can afford to be inclusive)
-                    if len(tickets) >= 3:
+                    if ticket_count >= 3:
                         threshold = 0.50  # More data = can be inclusive
-                    elif len(tickets) >= 2:
+                    elif ticket_count >= 2:
                         threshold = 0.55  # Moderate
                     else:
                         threshold = 0.60  # Single ticket = be selective
                     
                     logger.info(
-                        f"Category '{cat}': {len(tickets)} tickets, no same-category matches in Qdrant, "
+                        f"Category '{cat}': {ticket_count} tickets, no same-category matches in Qdrant, "
                         f"using adaptive threshold {threshold:.2f}"
                     )
                 
@@ -12,22 +12,27 @@ When tickets are created/updated/deleted, this service:
 """
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
-from datetime import datetime
 from uuid import UUID
 import uuid as uuid_lib
 
-from core.database import SessionLocal, Embedding, Ticket, SimilarIssues
+from core.database import SessionLocal, Embedding, Ticket, SimilarIssues, reuse_or_open_session
 from .embedding_api_client import EmbeddingAPIClient
 from .ticket_search_service import TicketSearchService
 from .event_queue import EventQueue, EventType
 from qdrant_client import QdrantClient
 from qdrant_client.models import PointStruct, Distance, VectorParams, Filter, FieldCondition, MatchValue
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Deletes Qdrant points of deprecated embeddings off the request path
+_qdrant_cleanup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="qdrant-cleanup")
+
 
 class EmbeddingManager:
     """Service to synchronously manage embeddings with Qdrant sync"""
@@ -196,6 +201,84 @@ class EmbeddingManager:
             return False
     
 
+    @staticmethod
+    def _delete_qdrant_embeddings(vector_ids: List[Optional[str]]) -> int:
+        """
+        Delete several embeddings from Qdrant in one request.
+        
+        Args:
+            vector_ids: Point IDs in Qdrant (None entries are skipped)
+            
+        Returns:
+            Number of points deleted (0 if the request failed)
+        """
+        vector_ids = [vector_id for vector_id in vector_ids if vector_id]
+        if not vector_ids:
+            return 0
+        
+        try:
+            client = EmbeddingManager._get_qdrant_client()
+            client.delete(
+                collection_name=EmbeddingManager.QDRANT_COLLECTION,
+                points_selector=vector_ids
+            )
+            
+            logger.info(f"✓ Deleted {len(vector_ids)} Qdrant embeddings")
+            return len(vector_ids)
+            
+        except Exception as e:
+            logger.warning(f"Failed to delete {len(vector_ids)} Qdrant embeddings: {e}")
+            return 0
+    
+    @staticmethod
+    def _delete_qdrant_embeddings_later(vector_ids: List[Optional[str]]) -> int:
+        """
+        Queue deprecated points for deletion from Qdrant.
+        
+        Only call after the deprecation is committed - PostgreSQL stays the
+        source of truth, so a failed delete only leaves a stale point behind.
+        
+        Args:
+            vector_ids: Point IDs in Qdrant (None entries are skipped)
+            
+        Returns:
+            Number of points queued
+        """
+        vector_ids = [vector_id for vector_id in vector_ids if vector_id]
+        if vector_ids:
+            _qdrant_cleanup_executor.submit(EmbeddingManager._delete_qdrant_embeddings, vector_ids)
+        return len(vector_ids)
+    
+    @staticmethod
+    def _deprecate_active_embeddings(db, reason: str, *criteria) -> List[Optional[str]]:
+        """
+        Mark matching active embeddings inactive (does not commit).
+        
+        One UPDATE ... RETURNING, instead of selecting the rows first and
+        updating them in a second statement.
+        
+        Args:
+            db: Database session
+            reason: Deprecation reason to record
+            *criteria: Extra filters on Embedding
+            
+        Returns:
+            vector_id of each deprecated embedding (None if never synced)
+        """
+        stmt = (
+            update(Embedding)
+            .where(Embedding.is_active == True, *criteria)
+            .values(
+                is_active=False,
+                deprecated_at=func.current_date(),
+                deprecation_reason=reason
+            )
+            .returning(Embedding.vector_id)
+            .execution_options(synchronize_session=False)
+        )
+        return [vector_id for (vector_id,) in db.execute(stmt)]
+    
+
     @staticmethod
     def create_ticket_embeddings(
         ticket_id: str,
@@ -353,33 +436,18 @@ class EmbeddingManager:
             
             logger.info(f"Creating RCA embedding for ticket {ticket_id}")
             
-            # Deprecate old RCA embedding if it exists
-            deprecated_count = db.query(Embedding).filter(
+            # Deprecate old RCA embedding if it exists - RETURNING gives the
+            # Qdrant points without loading the rows (and their text) back
+            vector_ids = EmbeddingManager._deprecate_active_embeddings(
+                db,
+                "rca_updated",
                 Embedding.ticket_id == ticket_uuid,
-                Embedding.source_type == "rca",
-                Embedding.is_active == True
-            ).update({
-                Embedding.is_active: False,
-                Embedding.deprecated_at: datetime.utcnow(),
-                Embedding.deprecation_reason: "rca_updated"
-            }, synchronize_session=False)
-            
-            if deprecated_count > 0:
-                logger.info(f"Deprecated {deprecated_count} old RCA embeddings")
-            
-            # Also update Qdrant for deprecated RCA embeddings
-            old_rcas = db.query(Embedding).filter(
-                Embedding.ticket_id == ticket_uuid,
-                Embedding.source_type == "rca",
-                Embedding.is_active == False
-            ).all()
-            
-            for old_rca in old_rcas:
-                if old_rca.vector_id:
-                    EmbeddingManager._delete_qdrant_embedding(
-                        embedding_id=str(old_rca.id),
-                        vector_id=old_rca.vector_id,
-                    )
+                Embedding.source_type == "rca"
+            )
+            
+            if vector_ids:
+                logger.info(f"Deprecated {len(vector_ids)} old RCA embeddings")
+                EmbeddingManager._delete_qdrant_embeddings(vector_ids)
             
             # Build RCA text for embedding
             rca_text = root_cause_description
@@ -428,54 +496,41 @@ class EmbeddingManager:
     @staticmethod
     def deprecate_ticket_embeddings(
         ticket_id: str,
-        reason: Optional[str] = None
+        reason: Optional[str] = None,
+        db: Optional[Session] = None
     ) -> bool:
-        """Deprecate all embeddings for a ticket (mark inactive in PostgreSQL, delete from Qdrant)"""
-        db = SessionLocal()
-        try:
-            ticket_uuid = UUID(ticket_id)
-            
-            # Get all active embeddings for this ticket before deprecating
-            embeddings_to_deprecate = db.query(Embedding).filter(
-                Embedding.ticket_id == ticket_uuid,
-                Embedding.is_active == True
-            ).all()
-            
-            # Update PostgreSQL - mark as inactive
-            deprecated_count = db.query(Embedding).filter(
-                Embedding.ticket_id == ticket_uuid,
-                Embedding.is_active == True
-            ).update({
-                Embedding.is_active: False,
-                Embedding.deprecated_at: datetime.utcnow(),
-                Embedding.deprecation_reason: reason or "ticket_deleted"
-            }, synchronize_session=False)
-            
-            db.commit()
-            
-            # Delete from Qdrant for each deprecated embedding
-            qdrant_deleted = 0
-            for embedding in embeddings_to_deprecate:
-                if embedding.vector_id:
-                    success = EmbeddingManager._delete_qdrant_embedding(
-                        embedding_id=str(embedding.id),
-                        vector_id=embedding.vector_id
-                    )
-                    if success:
-                        qdrant_deleted += 1
-            
-            if deprecated_count > 0:
-                logger.info(f"✓ Deprecated {deprecated_count} embeddings for ticket {ticket_id} "
-                           f"({qdrant_deleted} deleted from Qdrant)")
-            
-            return True
-            
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Failed to deprecate ticket embeddings: {e}")
-            return False
-        finally:
-            db.close()
+        """
+        Deprecate all embeddings for a ticket (mark inactive in PostgreSQL, delete from Qdrant).
+        
+        Covers every source type (ticket, resolution, RCA, attachments). Pass
+        the caller's session as db to run on it rather than opening another.
+        """
+        with reuse_or_open_session(db) as db:
+            try:
+                ticket_uuid = UUID(ticket_id)
+                
+                # Mark inactive, collecting the Qdrant point of each (one statement)
+                vector_ids = EmbeddingManager._deprecate_active_embeddings(
+                    db,
+                    reason or "ticket_deleted",
+                    Embedding.ticket_id == ticket_uuid
+                )
+                
+                db.commit()
+                
+                # Qdrant cleanup runs in the background once the commit is done
+                qdrant_queued = EmbeddingManager._delete_qdrant_embeddings_later(vector_ids)
+                
+                if vector_ids:
+                    logger.info(f"✓ Deprecated {len(vector_ids)} embeddings for ticket {ticket_id} "
+                               f"({qdrant_queued} queued for Qdrant deletion)")
+                
+                return True
+                
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Failed to deprecate ticket embeddings: {e}")
+                return False
     
     @staticmethod
     def add_ir_embedding(
@@ -560,34 +615,18 @@ class EmbeddingManager:
             
             logger.info(f"Updating IR embedding for {ir_number}")
             
-            # Get old IR embeddings before deprecating
-            old_embeddings = db.query(Embedding).filter(
+            # Deprecate old IR embedding if it exists - RETURNING gives the
+            # Qdrant points without loading the rows (and their text) first
+            vector_ids = EmbeddingManager._deprecate_active_embeddings(
+                db,
+                "ir_updated",
                 Embedding.ticket_id == ticket_uuid,
-                Embedding.source_type == "ir",
-                Embedding.is_active == True
-            ).all()
+                Embedding.source_type == "ir"
+            )
             
-            # Deprecate old IR embedding if it exists
-            deprecated_count = db.query(Embedding).filter(
-                Embedding.ticket_id == ticket_uuid,
-                Embedding.source_type == "ir",
-                Embedding.is_active == True
-            ).update({
-                Embedding.is_active: False,
-                Embedding.deprecated_at: datetime.utcnow(),
-                Embedding.deprecation_reason: "ir_updated"
-            }, synchronize_session=False)
-            
-            if deprecated_count > 0:
-                logger.info(f"Deprecated {deprecated_count} old IR embeddings")
-                
-                # Delete from Qdrant
-                for old_emb in old_embeddings:
-                    if old_emb.vector_id:
-                        EmbeddingManager._delete_qdrant_embedding(
-                            embedding_id=str(old_emb.id),
-                            vector_id=old_emb.vector_id
-                        )
+            if vector_ids:
+                logger.info(f"Deprecated {len(vector_ids)} old IR embeddings")
+                EmbeddingManager._delete_qdrant_embeddings(vector_ids)
             
             # Build updated IR text for embedding
             ir_text = f"Incident Report {ir_number} - {vendor}"
@@ -647,39 +686,21 @@ class EmbeddingManager:
         try:
             ticket_uuid = UUID(ticket_id)
             
-            # Get all active IR embeddings for this ticket
-            embeddings_to_deprecate = db.query(Embedding).filter(
+            # Mark inactive, collecting the Qdrant point of each (one statement)
+            vector_ids = EmbeddingManager._deprecate_active_embeddings(
+                db,
+                reason or "ir_deleted",
                 Embedding.ticket_id == ticket_uuid,
-                Embedding.source_type == "ir",
-                Embedding.is_active == True
-            ).all()
-            
-            # Update PostgreSQL - mark as inactive
-            deprecated_count = db.query(Embedding).filter(
-                Embedding.ticket_id == ticket_uuid,
-                Embedding.source_type == "ir",
-                Embedding.is_active == True
-            ).update({
-                Embedding.is_active: False,
-                Embedding.deprecated_at: datetime.utcnow(),
-                Embedding.deprecation_reason: reason or "ir_deleted"
-            }, synchronize_session=False)
+                Embedding.source_type == "ir"
+            )
             
             db.commit()
             
-            # Delete from Qdrant for each embedding
-            qdrant_deleted = 0
-            for embedding in embeddings_to_deprecate:
-                if embedding.vector_id:
-                    success = EmbeddingManager._delete_qdrant_embedding(
-                        embedding_id=str(embedding.id),
-                        vector_id=embedding.vector_id
-                    )
-                    if success:
-                        qdrant_deleted += 1
+            # Qdrant cleanup runs in the background once the commit is done
+            qdrant_queued = EmbeddingManager._delete_qdrant_embeddings_later(vector_ids)
             
-            if deprecated_count > 0:
-                logger.info(f"✓ Deprecated {deprecated_count} IR embeddings ({qdrant_deleted} deleted from Qdrant)")
+            if vector_ids:
+                logger.info(f"✓ Deprecated {len(vector_ids)} IR embeddings ({qdrant_queued} queued for Qdrant deletion)")
             
             return True
             
@@ -710,33 +731,18 @@ class EmbeddingManager:
             
             logger.info(f"Creating resolution embedding for ticket {ticket_id}")
             
-            # Deprecate old resolution embedding if it exists
-            deprecated_count = db.query(Embedding).filter(
+            # Deprecate old resolution embedding if it exists - RETURNING gives
+            # the Qdrant points without loading the rows (and their text) back
+            vector_ids = EmbeddingManager._deprecate_active_embeddings(
+                db,
+                "resolution_updated",
                 Embedding.ticket_id == ticket_uuid,
-                Embedding.source_type == "resolution",
-                Embedding.is_active == True
-            ).update({
-                Embedding.is_active: False,
-                Embedding.deprecated_at: datetime.utcnow(),
-                Embedding.deprecation_reason: "resolution_updated"
-            }, synchronize_session=False)
-            
-            if deprecated_count > 0:
-                logger.info(f"Deprecated {deprecated_count} old resolution embeddings")
-                
-                # Also update Qdrant for deprecated embeddings
-                old_embeddings = db.query(Embedding).filter(
-                    Embedding.ticket_id == ticket_uuid,
-                    Embedding.source_type == "resolution",
-                    Embedding.is_active == False
-                ).all()
-                
-                for old_emb in old_embeddings:
-                    if old_emb.vector_id:
-                        EmbeddingManager._delete_qdrant_embedding(
-                            embedding_id=str(old_emb.id),
-                            vector_id=old_emb.vector_id,
-                        )
+                Embedding.source_type == "resolution"
+            )
+            
+            if vector_ids:
+                logger.info(f"Deprecated {len(vector_ids)} old resolution embeddings")
+                EmbeddingManager._delete_qdrant_embeddings(vector_ids)
             
             # Build resolution text for embedding
             resolution_text = solution_description
@@ -793,39 +799,21 @@ class EmbeddingManager:
         try:
             ticket_uuid = UUID(ticket_id)
             
-            # Get all active resolution embeddings for this ticket
-            embeddings_to_deprecate = db.query(Embedding).filter(
+            # Mark inactive, collecting the Qdrant point of each (one statement)
+            vector_ids = EmbeddingManager._deprecate_active_embeddings(
+                db,
+                reason or "resolution_deleted",
                 Embedding.ticket_id == ticket_uuid,
-                Embedding.source_type == "resolution",
-                Embedding.is_active == True
-            ).all()
-            
-            # Update PostgreSQL - mark as inactive
-            deprecated_count = db.query(Embedding).filter(
-                Embedding.ticket_id == ticket_uuid,
-                Embedding.source_type == "resolution",
-                Embedding.is_active == True
-            ).update({
-                Embedding.is_active: False,
-                Embedding.deprecated_at: datetime.utcnow(),
-                Embedding.deprecation_reason: reason or "resolution_deleted"
-            }, synchronize_session=False)
+                Embedding.source_type == "resolution"
+            )
             
             db.commit()
             
-            # Delete from Qdrant for each embedding
-            qdrant_deleted = 0
-            for embedding in embeddings_to_deprecate:
-                if embedding.vector_id:
-                    success = EmbeddingManager._delete_qdrant_embedding(
-                        embedding_id=str(embedding.id),
-                        vector_id=embedding.vector_id
-                    )
-                    if success:
-                        qdrant_deleted += 1
+            # Qdrant cleanup runs in the background once the commit is done
+            qdrant_queued = EmbeddingManager._delete_qdrant_embeddings_later(vector_ids)
             
-            if deprecated_count > 0:
-                logger.info(f"✓ Deprecated {deprecated_count} resolution embeddings ({qdrant_deleted} deleted from Qdrant)")
+            if vector_ids:
+                logger.info(f"✓ Deprecated {len(vector_ids)} resolution embeddings ({qdrant_queued} queued for Qdrant deletion)")
             
             return True
             
@@ -870,29 +858,43 @@ class EmbeddingManager:
                 score_threshold=0.5
             )
             
-            # Create SimilarIssues links for tickets scoring >= 70
-            similarity_count = 0
+            # Best score per older ticket scoring >= 70. Results come best
+            # first, and one ticket can appear once per embedding it has
+            best_scores = {}
             for result in results:
                 old_ticket_id = result.payload.get("ticket_id")
-                if old_ticket_id == ticket_id:
+                if old_ticket_id == ticket_id or old_ticket_id in best_scores:
                     continue
                 
                 score = int(result.score * 100)  # Convert to 0-100
                 if score >= 70:
-                    # Check if similarity link already exists
-                    existing = db.query(SimilarIssues).filter(
-                        SimilarIssues.newer_ticket_id == UUID(ticket_id),
-                        SimilarIssues.older_ticket_id == UUID(old_ticket_id)
-                    ).first()
-                    
-                    if not existing:
-                        similar = SimilarIssues(
-                            newer_ticket_id=UUID(ticket_id),
-                            older_ticket_id=UUID(old_ticket_id),
-                            similarity_score=score
-                        )
-                        db.add(similar)
-                        similarity_count += 1
+                    best_scores[old_ticket_id] = score
+            
+            # Create SimilarIssues links, skipping existing ones (one query)
+            # and inserting the rest in one multi-row INSERT
+            similarity_count = 0
+            if best_scores:
+                newer_ticket_id = UUID(ticket_id)
+                older_ticket_ids = {old_ticket_id: UUID(old_ticket_id) for old_ticket_id in best_scores}
+                existing = {
+                    older_id for (older_id,) in db.query(SimilarIssues.older_ticket_id).filter(
+                        SimilarIssues.newer_ticket_id == newer_ticket_id,
+                        SimilarIssues.older_ticket_id.in_(older_ticket_ids.values())
+                    )
+                }
+                
+                rows = [
+                    {
+                        "newer_ticket_id": newer_ticket_id,
+                        "older_ticket_id": older_ticket_ids[old_ticket_id],
+                        "similarity_score": score
+                    }
+                    for old_ticket_id, score in best_scores.items()
+                    if older_ticket_ids[old_ticket_id] not in existing
+                ]
+                if rows:
+                    db.execute(insert(SimilarIssues), rows)
+                similarity_count = len(rows)
             
             db.commit()
             
@@ -735,24 +735,17 @@ class TicketCreationService:
 
             logger.info(f"Deleting ticket {ticket.ticket_no}...")
 
-            # Deprecate embeddings
+            # Deprecate embeddings - ticket_id covers the resolution and
+            # attachment embeddings too, so one statement on this session
             try:
-                EmbeddingManager.deprecate_resolution_embeddings(ticket_id=ticket_id, reason="ticket_deleted")
-                EmbeddingManager.deprecate_ticket_embeddings(ticket_id=ticket_id, reason="ticket_deleted")
+                EmbeddingManager.deprecate_ticket_embeddings(
+                    ticket_id=ticket_id, reason="ticket_deleted", db=db
+                )
                 logger.info(f"✓ Deprecated embeddings")
             except Exception as e:
                 logger.warning(f"Failed to deprecate embeddings: {e}")
 
-            # Deprecate attachment embeddings
             attachments = db.query(Attachment).filter(Attachment.ticket_id == ticket_uuid).all()
-            for attachment in attachments:
-                try:
-                    AttachmentProcessor.deprecate_attachment(
-                        attachment_id=str(attachment.id),
-                        reason="ticket_deleted"
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to deprecate attachment {attachment.id}: {e}")
 
             # Log deletion event
             deletion_event = TicketEvent(
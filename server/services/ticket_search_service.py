@@ -11,7 +11,8 @@ from typing import List, Optional, Dict, Any
 from uuid import UUID
 
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance
+from qdrant_client.models import Distance, Filter, FieldCondition, MatchValue
+from sqlalchemy.orm import joinedload
 from core.database import SessionLocal, Ticket
 from utils.datetime_utils import to_iso_date
 from services.embedding_api_client import EmbeddingAPIClient
@@ -67,65 +68,81 @@ class TicketSearchService:
             
             logger.info(f"Searching for tickets similar to: {query}")
             
-            # Search in Qdrant
+            # Search in Qdrant - scoped to the company on the indexed payload
+            # field, so other tenants' tickets can't crowd out the top hits
+            query_filter = None
+            if company_id:
+                query_filter = Filter(
+                    must=[
+                        FieldCondition(
+                            key="company_id",
+                            match=MatchValue(value=str(company_id))
+                        )
+                    ]
+                )
+            
             qdrant_client = TicketSearchService._get_qdrant_client()
             qdrant_results = qdrant_client.search(
                 collection_name=TicketSearchService.QDRANT_COLLECTION,
                 query_vector=query_vector,
+                query_filter=query_filter,
                 limit=limit * 2,  # Get more to filter
                 score_threshold=threshold
             )
             
-            # Deduplicate and fetch ticket details
-            ticket_ids = set()
+            # Deduplicate, keeping each ticket's best hit in score order
+            hits = {}
+            for qdrant_point in qdrant_results:
+                ticket_id = qdrant_point.payload.get("ticket_id")
+                if ticket_id in hits:
+                    continue
+                try:
+                    hits[ticket_id] = (UUID(ticket_id), qdrant_point)
+                except (TypeError, ValueError):
+                    logger.warning(f"Skipping hit with invalid ticket_id: {ticket_id}")
+            
+            if not hits:
+                logger.info("Found 0 similar tickets")
+                return []
+            
+            # Fetch every hit's ticket, engineer and RCA in one query instead
+            # of a SELECT per hit plus lazy loads per ticket
+            ticket_query = db.query(Ticket).options(
+                joinedload(Ticket.assigned_engineer),
+                joinedload(Ticket.root_cause_analysis),
+            ).filter(Ticket.id.in_([uuid for uuid, _ in hits.values()]))
+            if company_id:
+                ticket_query = ticket_query.filter(Ticket.company_id == UUID(company_id))
+            tickets = {ticket.id: ticket for ticket in ticket_query.all()}
+            
             results = []
             
-            for qdrant_point in qdrant_results:
-                payload = qdrant_point.payload
-                ticket_id = payload.get("ticket_id")
-                
-                # Skip duplicates
-                if ticket_id in ticket_ids:
+            for ticket_id, (ticket_uuid, qdrant_point) in hits.items():
+                ticket = tickets.get(ticket_uuid)
+                if not ticket:
                     continue
                 
-                ticket_ids.add(ticket_id)
+                payload = qdrant_point.payload
+                
+                # Build result with ticket details + embedding metadata
+                result = {
+                    "similarity_score": qdrant_point.score,
+                    "ticket_id": ticket_id,
+                    "ticket_no": ticket.ticket_no,
+                    "subject": ticket.subject,
+                    "status": ticket.status,
+                    "category": ticket.category,
+                    "assigned_to": ticket.assigned_engineer.name if ticket.assigned_engineer else None,
+                    "embedding_source_type": payload.get("source_type"),
+                    "embedding_text": payload.get("text", "")[:150],
+                    "has_rca": ticket.root_cause_analysis is not None,
+                    "created_at": to_iso_date(ticket.created_at) if ticket.created_at else None,
+                }
                 
-                # Fetch ticket details
-                try:
-                    ticket = db.query(Ticket).filter(
-                        Ticket.id == UUID(ticket_id)
-                    ).first()
-                    
-                    if not ticket:
-                        continue
-                    
-                    # Filter by company if specified
-                    if company_id and str(ticket.company_id) != company_id:
-                        continue
-                    
-                    # Build result with ticket details + embedding metadata
-                    result = {
-                        "similarity_score": qdrant_point.score,
-                        "ticket_id": ticket_id,
-                        "ticket_no": ticket.ticket_no,
-                        "subject": ticket.subject,
-                        "status": ticket.status,
-                        "category": ticket.category,
-                        "assigned_to": ticket.assigned_engineer.name if ticket.assigned_engineer else None,
-                        "embedding_source_type": payload.get("source_type"),
-                        "embedding_text": payload.get("text", "")[:150],
-                        "has_rca": ticket.rca is not None,
-                        "created_at": to_iso_date(ticket.created_at) if ticket.created_at else None,
-                    }
-                    
-                    results.append(result)
-                    
-                    if len(results) >= limit:
-                        break
+                results.append(result)
                 
-                except Exception as e:
-                    logger.warning(f"Error fetching ticket {ticket_id}: {e}")
-                    continue
+                if len(results) >= limit:
+                    break
             
             logger.info(f"Found {len(results)} similar tickets")
             return results
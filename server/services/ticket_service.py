@@ -2,16 +2,30 @@
 """Ticket retrieval and update service with embedding management"""
 
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime, date, timedelta
 from uuid import UUID
 
-from core.database import SessionLocal, Ticket, TicketEvent, AdminAuditLog, User
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+
+from core.database import SessionLocal, Ticket, TicketEvent, AdminAuditLog, User, RootCauseAnalysis
 from utils.exceptions import ValidationError, NotFoundError, ConflictError
 from core.logger import get_logger
 from utils.datetime_utils import serialize_date_fields, to_iso_date
 logger = get_logger(__name__)
 
+# Everything _format_ticket reads - many-to-one parents are joined into the
+# ticket query, collections come in one IN query each for the whole page
+TICKET_LOAD_OPTIONS = (
+    joinedload(Ticket.company),
+    joinedload(Ticket.raised_by_user),
+    joinedload(Ticket.assigned_engineer),
+    selectinload(Ticket.attachments),
+    selectinload(Ticket.root_cause_analysis).selectinload(RootCauseAnalysis.attachments),
+    selectinload(Ticket.resolution_note),
+)
+
 
 class TicketService:
     """Service for ticket retrieval and updates"""
@@ -77,13 +91,19 @@ class TicketService:
             # Get total count before pagination
             total = query.count()
             
-            # Apply pagination and ordering (latest first)
-            tickets = query.order_by(Ticket.created_at.desc()).limit(limit).offset(offset).all()
+            # Apply pagination and ordering (latest first), eager-loading the
+            # relationships so a page costs a fixed number of queries
+            tickets = query.options(*TICKET_LOAD_OPTIONS).order_by(
+                Ticket.created_at.desc()
+            ).limit(limit).offset(offset).all()
             
             logger.info(f"Retrieved {len(tickets)} tickets (total: {total}, limit: {limit}, offset: {offset}, search: {search})")
             
+            # Event history for the whole page in one query
+            events = TicketService._load_events(db, [t.id for t in tickets])
+            
             return {
-                "tickets": [TicketService._format_ticket(t) for t in tickets],
+                "tickets": [TicketService._format_ticket(t, events[t.id]) for t in tickets],
                 "total": total,
                 "limit": limit,
                 "offset": offset
@@ -100,11 +120,13 @@ class TicketService:
         """Get ticket by ID with all related data"""
         db = SessionLocal()
         try:
-            ticket = db.query(Ticket).filter(Ticket.id == UUID(ticket_id)).first()
+            ticket = db.query(Ticket).options(*TICKET_LOAD_OPTIONS).filter(
+                Ticket.id == UUID(ticket_id)
+            ).first()
             if not ticket:
                 raise NotFoundError("Ticket not found")
             
-            return TicketService._format_ticket(ticket)
+            return TicketService._format_single_ticket(db, ticket)
         finally:
             db.close()
     
@@ -114,18 +136,65 @@ class TicketService:
         """Get ticket by ticket number"""
         db = SessionLocal()
         try:
-            ticket = db.query(Ticket).filter(Ticket.ticket_no == ticket_no).first()
+            ticket = db.query(Ticket).options(*TICKET_LOAD_OPTIONS).filter(
+                Ticket.ticket_no == ticket_no
+            ).first()
             if not ticket:
                 raise NotFoundError(f"Ticket {ticket_no} not found")
             
-            return TicketService._format_ticket(ticket)
+            return TicketService._format_single_ticket(db, ticket)
         finally:
             db.close()
     
     
     @staticmethod
-    def _format_ticket(ticket) -> Dict[str, Any]:
-        """Format ticket object as dictionary"""
+    def _load_events(db, ticket_ids: List[UUID]) -> Dict[UUID, List[Dict[str, Any]]]:
+        """
+        Load the event history of several tickets in one query, oldest first.
+        
+        Selects only the columns the response uses, plus the actor's name,
+        instead of lazy-loading each ticket's events and each event's actor.
+        
+        Returns:
+            Mapping of ticket ID -> formatted events
+        """
+        events = {ticket_id: [] for ticket_id in ticket_ids}
+        if not ticket_ids:
+            return events
+        
+        rows = db.query(
+            TicketEvent.ticket_id,
+            TicketEvent.id,
+            TicketEvent.event_type,
+            TicketEvent.actor_user_id,
+            User.name,
+            TicketEvent.payload,
+            TicketEvent.created_at
+        ).outerjoin(
+            User, User.id == TicketEvent.actor_user_id
+        ).filter(
+            TicketEvent.ticket_id.in_(ticket_ids)
+        ).order_by(TicketEvent.created_at)
+        
+        for ticket_id, event_id, event_type, actor_user_id, actor_name, payload, created_at in rows:
+            events[ticket_id].append({
+                "id": str(event_id),
+                "event_type": event_type,
+                "actor_user_id": str(actor_user_id),
+                "actor": actor_name,
+                "payload": payload,
+                "created_at": to_iso_date(created_at)
+            })
+        return events
+    
+    @staticmethod
+    def _format_single_ticket(db, ticket) -> Dict[str, Any]:
+        """Format one ticket, loading its events"""
+        return TicketService._format_ticket(ticket, TicketService._load_events(db, [ticket.id])[ticket.id])
+    
+    @staticmethod
+    def _format_ticket(ticket, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Format ticket object as dictionary (events from _load_events)"""
         response = {
             "id": str(ticket.id),
             "ticket_no": ticket.ticket_no,
@@ -195,17 +264,7 @@ class TicketService:
                 "created_at": to_iso_date(ticket.resolution_note.created_at),
                 "updated_at": to_iso_date(ticket.resolution_note.updated_at)
             } if ticket.resolution_note else None,
-            "events": [
-                {
-                    "id": str(event.id),
-                    "event_type": event.event_type,
-                    "actor_user_id": str(event.actor_user_id),
-                    "actor": event.actor_user.name if event.actor_user else None,
-                    "payload": event.payload,
-                    "created_at": to_iso_date(event.created_at)
-                }
-                for event in ticket.events
-            ] if ticket.events else [],
+            "events": events,
             "has_ir": ticket.has_ir or False,
             "ir_number": ticket.ir_number,
             "ir_raised_at": to_iso_date(ticket.ir_raised_at) if ticket.ir_raised_at else None,
@@ -281,7 +340,8 @@ class TicketService:
                     from .embedding_manager import EmbeddingManager
                     EmbeddingManager.deprecate_ticket_embeddings(
                         ticket_id=ticket_id,
-                        reason=f"ticket_{new_status}"
+                        reason=f"ticket_{new_status}",
+                        db=db
                     )
                 except Exception as e:
                     logger.warning(f"Failed to deprecate embeddings: {e}")
@@ -303,7 +363,7 @@ class TicketService:
                 except Exception as e:
                     logger.warning(f"Failed to create audit log: {e}")
             
-            return TicketService._format_ticket(ticket)
+            return TicketService._format_single_ticket(db, ticket)
             
         except (ValidationError, NotFoundError):
             db.rollback()
@@ -395,7 +455,7 @@ class TicketService:
                 except Exception as e:
                     logger.warning(f"Failed to create audit log: {e}")
             
-            return TicketService._format_ticket(ticket)
+            return TicketService._format_single_ticket(db, ticket)
             
         except (ValidationError, NotFoundError):
             db.rollback()
@@ -435,59 +495,56 @@ class TicketService:
             
             logger.info(f"Getting analytics for last {days} days (from {start_date} to {now})")
             
-            # Base query for tickets
-            query = db.query(Ticket)
+            # Counts per status/level/category come from one GROUP BY each
+            # instead of a COUNT(*) per bucket
+            status_counts = dict(
+                db.query(Ticket.status, func.count()).group_by(Ticket.status).all()
+            )
+            level_counts = dict(
+                db.query(Ticket.level, func.count()).group_by(Ticket.level).all()
+            )
+            category_counts = db.query(Ticket.category, func.count()).filter(
+                Ticket.category.isnot(None)
+            ).group_by(Ticket.category).all()
             
-            # Total tickets (all time)
-            total_tickets = query.count()
+            # Total tickets (all time) - status is never NULL
+            total_tickets = sum(status_counts.values())
             
             # Tickets by status
             tickets_by_status = {}
             for status in ["open", "in_progress", "resolved", "closed", "reopened"]:
-                count = query.filter(Ticket.status == status).count()
+                count = status_counts.get(status, 0)
                 if count > 0:
                     tickets_by_status[status] = count
             
             # Tickets by level
             tickets_by_level = {}
             for level in ["level-1", "level-2", "level-3"]:
-                count = query.filter(Ticket.level == level).count()
+                count = level_counts.get(level, 0)
                 if count > 0:
                     tickets_by_level[level] = count
             
             # Tickets by category
-            tickets_by_category = {}
-            categories = db.query(Ticket.category).distinct().filter(
-                Ticket.category.isnot(None)
-            ).all()
-            for (category,) in categories:
-                if category:
-                    count = query.filter(Ticket.category == category).count()
-                    tickets_by_category[category] = count
-            
-            # Tickets created in the last N days
-            tickets_created_last_n_days = query.filter(
-                Ticket.created_at >= start_date
-            ).count()
-            
-            # Closed tickets in the last N days
-            closed_last_n_days = query.filter(
-                Ticket.closed_at >= start_date,
-                Ticket.closed_at.isnot(None)
-            ).count()
+            tickets_by_category = {
+                category: count for category, count in category_counts if category
+            }
+            
+            # Tickets created / closed in the last N days, in one round trip
+            tickets_created_last_n_days, closed_last_n_days = db.query(
+                func.count().filter(Ticket.created_at >= start_date),
+                func.count().filter(Ticket.closed_at >= start_date),
+            ).one()
             
             # Open tickets count
-            open_tickets = query.filter(
-                Ticket.status.in_(["open", "in_progress"])
-            ).count()
+            open_tickets = status_counts.get("open", 0) + status_counts.get("in_progress", 0)
             
             # Closed tickets count (all time)
-            closed_tickets = query.filter(
-                Ticket.status.in_(["closed", "resolved"])
-            ).count()
+            closed_tickets = status_counts.get("closed", 0) + status_counts.get("resolved", 0)
             
             avg_resolution_time = 0
-            closed_tickets_for_period = query.filter(
+            closed_tickets_for_period = db.query(
+                Ticket.ticket_no, Ticket.created_at, Ticket.closed_at
+            ).filter(
                 Ticket.status.in_(["closed", "resolved"]),
                 Ticket.closed_at.isnot(None),
                 Ticket.closed_at >= start_date,
@@ -521,23 +578,16 @@ class TicketService:
             if total_tickets > 0:
                 resolution_rate = round((closed_tickets / total_tickets) * 100, 2)
             
-            # Ticket trends (daily count for last N days)
-            trends = []
-            current_date = start_date  # Already a date object from timedelta operation
-            end_date = now  # Already a date object from date.today()
-
-            while current_date <= end_date:
-                daily_count = query.filter(
-                    Ticket.created_at == current_date
-                ).count()
-                
-                if daily_count > 0:
-                    trends.append({
-                        "date": to_iso_date(current_date),
-                        "count": daily_count
-                    })
-                
-                current_date += timedelta(days=1)
+            # Ticket trends (daily count for last N days, days without
+            # tickets omitted) - one GROUP BY instead of a query per day
+            daily_counts = db.query(Ticket.created_at, func.count()).filter(
+                Ticket.created_at >= start_date,
+                Ticket.created_at <= now
+            ).group_by(Ticket.created_at).order_by(Ticket.created_at).all()
+            trends = [
+                {"date": to_iso_date(day), "count": daily_count}
+                for day, daily_count in daily_counts
+            ]
             
             logger.info(f"Analytics retrieved: {total_tickets} total, {open_tickets} open, {closed_tickets} closed")
             
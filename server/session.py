@@ -1,23 +1,28 @@
 # session.py - CORRECTED with validation and fixes
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
-from enum import Enum
+from typing import Iterator, List, Optional
+from enum import StrEnum
 
 from utils.datetime_utils import to_iso_date
 
 # Define all enum options as dynamic sources
-class Environment(str, Enum):
+# StrEnum members are their values, so they format and serialize as plain text
+class Environment(StrEnum):
     PRODUCTION = "Production"
     TEST_UAT = "Test / UAT"
     LOCAL = "Local system"
 
-class ImpactLevel(str, Enum):
+class ImpactLevel(StrEnum):
     COMPLETELY_BLOCKED = "Completely blocked"
     PARTIALLY_BLOCKED = "Partially blocked"
     SLOW_USABLE = "Slow but usable"
 
-class IssueCategory(str, Enum):
+class IssueCategory(StrEnum):
     LOGIN_ACCESS = "Login / Access"
     LICENSE = "License"
     INSTALLATION = "Installation"
@@ -46,6 +51,20 @@ SUPPORTED_SOFTWARE = {
     "active workspace": "Active Workspace",
 }
 
+# Bit per required field in SupportSession.filled_mask
+REQUIRED_FIELD_BITS = {
+    "user_name": 1,
+    "company_name": 2,
+    "issue_description": 4,
+    "software": 8,
+    "environment": 16,
+    "impact": 32,
+}
+ALL_REQUIRED_MASK = 63
+
+# Anything but letters, digits, whitespace and ' - @ . , (\w also covers "_")
+_INVALID_CHARS_RE = re.compile(r"[^\w\s'\-@.,]|_")
+
 class ValidationError(Exception):
     """Custom validation error."""
     pass
@@ -64,27 +83,76 @@ def validate_string(value: str, field_name: str, min_len: int = 1, max_len: int
         raise ValidationError(f"{field_name} exceeds maximum length ({max_len} characters)")
     
     # Prevent injection/hallucination by checking for reasonable character sets
-    if not all(c.isalnum() or c.isspace() or c in "'-@.," for c in value):
+    if _INVALID_CHARS_RE.search(value):
         raise ValidationError(f"{field_name} contains invalid characters")
     
     return value
 
+# Map user input to enum (checked in order, first substring hit wins)
+ENVIRONMENT_KEYWORDS = (
+    ("prod", Environment.PRODUCTION),
+    ("production", Environment.PRODUCTION),
+    ("uat", Environment.TEST_UAT),
+    ("test", Environment.TEST_UAT),
+    ("local", Environment.LOCAL),
+)
+
+# Strict mapping to enum (checked in order)
+IMPACT_KEYWORDS = (
+    (("completely", "fully", "blocked", "unable"), ImpactLevel.COMPLETELY_BLOCKED),
+    (("partial",), ImpactLevel.PARTIALLY_BLOCKED),
+    (("slow", "sluggish", "usable"), ImpactLevel.SLOW_USABLE),
+)
+
+# Exact inputs resolved with one lookup instead of a keyword scan: the
+# canonical values (what extraction and the enums themselves pass back in)
+# and each keyword on its own. Canonical values map to themselves, so
+# "Partially blocked" no longer hits "blocked" first.
+_ENVIRONMENT_EXACT = {
+    **{key: enum_val for key, enum_val in reversed(ENVIRONMENT_KEYWORDS)},
+    **{env.value.lower(): env for env in Environment},
+}
+_IMPACT_EXACT = {
+    **{word: level for words, level in reversed(IMPACT_KEYWORDS) for word in words},
+    **{level.value.lower(): level for level in ImpactLevel},
+}
+def _keyword_ranks(groups) -> dict:
+    """Map each keyword to (rank, value); earlier groups rank first."""
+    ranks = {}
+    for rank, (words, value) in enumerate(groups):
+        for word in words:
+            ranks.setdefault(word, (rank, value))
+    return ranks
+
+# Keyword -> (rank, value) behind one alternation regex, so the substring
+# fallback is a single scan; the lowest rank found keeps the old precedence
+_ENVIRONMENT_RANKS = _keyword_ranks(((key,), env) for key, env in ENVIRONMENT_KEYWORDS)
+_IMPACT_RANKS = _keyword_ranks(IMPACT_KEYWORDS)
+_ENVIRONMENT_RE = re.compile("|".join(map(re.escape, _ENVIRONMENT_RANKS)))
+_IMPACT_RE = re.compile("|".join(map(re.escape, _IMPACT_RANKS)))
+
+
+def _best_keyword(pattern: re.Pattern, ranks: dict, value: str):
+    """Value of the highest-precedence keyword in text, or None."""
+    best = min((ranks[m.group()] for m in pattern.finditer(value)), default=None)
+    return best[1] if best is not None else None
+
+_SOFTWARE_EXACT = {
+    **SUPPORTED_SOFTWARE,
+    **{name.lower(): name for name in SUPPORTED_SOFTWARE.values()},
+}
+
 def validate_environment(value: str) -> Environment:
     """Validate and convert environment value."""
     value_lower = value.lower().strip()
     
-    # Map user input to enum
-    mapping = {
-        "prod": Environment.PRODUCTION,
-        "production": Environment.PRODUCTION,
-        "uat": Environment.TEST_UAT,
-        "test": Environment.TEST_UAT,
-        "local": Environment.LOCAL,
-    }
+    exact = _ENVIRONMENT_EXACT.get(value_lower)
+    if exact is not None:
+        return exact
     
-    for key, enum_val in mapping.items():
-        if key in value_lower:
-            return enum_val
+    found = _best_keyword(_ENVIRONMENT_RE, _ENVIRONMENT_RANKS, value_lower)
+    if found is not None:
+        return found
     
     raise ValidationError(f"Environment must be one of: {', '.join([e.value for e in Environment])}")
 
@@ -92,13 +160,13 @@ def validate_impact(value: str) -> ImpactLevel:
     """Validate and convert impact value."""
     value_lower = value.lower()
     
-    # Strict mapping to enum
-    if any(word in value_lower for word in ["completely", "fully", "blocked", "unable"]):
-        return ImpactLevel.COMPLETELY_BLOCKED
-    elif any(word in value_lower for word in ["partial"]):
-        return ImpactLevel.PARTIALLY_BLOCKED
-    elif any(word in value_lower for word in ["slow", "sluggish", "usable"]):
-        return ImpactLevel.SLOW_USABLE
+    exact = _IMPACT_EXACT.get(value_lower.strip())
+    if exact is not None:
+        return exact
+    
+    found = _best_keyword(_IMPACT_RE, _IMPACT_RANKS, value_lower)
+    if found is not None:
+        return found
     
     raise ValidationError(f"Impact must be one of: {', '.join([e.value for e in ImpactLevel])}")
 
@@ -109,6 +177,10 @@ def validate_software(value: str) -> str:
     
     value_lower = value.lower().strip()
     
+    exact = _SOFTWARE_EXACT.get(value_lower)
+    if exact is not None:
+        return exact
+    
     # Check if matches known software (use longest match to avoid partial matches)
     matches = []
     for keyword, software_name in SUPPORTED_SOFTWARE.items():
@@ -156,7 +228,27 @@ class SupportSession:
     edit_mode: bool = False
     edit_ticket_id: Optional[str] = None
     edit_ticket_data: Optional[dict] = None
+    # Pre-confirmation edit of a single field ("edit 3")
+    edit_field_mode: bool = False
+    edit_field_name: Optional[str] = None
+    edit_field_display: Optional[str] = None
+    # Required field the last bot reply asked for with a fixed template
+    last_prompted_field: Optional[str] = None
+    
+    # Bumped by every validated setter; keys the rendered LLM session context
+    version: int = 0
+    # REQUIRED_FIELD_BITS of the required fields currently set
+    filled_mask: int = 0
+    _context: Optional[tuple] = field(default=None, repr=False, compare=False)
 
+    def _mark_filled(self, field_name: str, value) -> None:
+        """Keep filled_mask in sync after a required field is assigned."""
+        bit = REQUIRED_FIELD_BITS[field_name]
+        if value is None:
+            self.filled_mask &= ~bit
+        else:
+            self.filled_mask |= bit
+    
     # Properties with validation
     @property
     def user_name(self) -> Optional[str]:
@@ -164,10 +256,12 @@ class SupportSession:
     
     @user_name.setter
     def user_name(self, value: str) -> None:
+        self.version += 1
         if value is None:
             self._user_name = None
         else:
             self._user_name = validate_string(value, "User name", min_len=2, max_len=100)
+        self._mark_filled("user_name", self._user_name)
     
     @property
     def company_name(self) -> Optional[str]:
@@ -175,10 +269,12 @@ class SupportSession:
     
     @company_name.setter
     def company_name(self, value: str) -> None:
+        self.version += 1
         if value is None:
             self._company_name = None
         else:
             self._company_name = validate_string(value, "Company name", min_len=2, max_len=150)
+        self._mark_filled("company_name", self._company_name)
     
     @property
     def issue_description(self) -> Optional[str]:
@@ -186,10 +282,12 @@ class SupportSession:
     
     @issue_description.setter
     def issue_description(self, value: str) -> None:
+        self.version += 1
         if value is None:
             self._issue_description = None
         else:
             self._issue_description = validate_string(value, "Issue description", min_len=10, max_len=2000)
+        self._mark_filled("issue_description", self._issue_description)
     
     @property
     def issue_category(self) -> Optional[IssueCategory]:
@@ -197,6 +295,7 @@ class SupportSession:
     
     @issue_category.setter
     def issue_category(self, value: IssueCategory) -> None:
+        self.version += 1
         if isinstance(value, str):
             # Try to match against enum values
             for category in IssueCategory:
@@ -217,10 +316,12 @@ class SupportSession:
     
     @software.setter
     def software(self, value: str) -> None:
+        self.version += 1
         if value is None:
             self._software = None
         else:
             self._software = validate_software(value)
+        self._mark_filled("software", self._software)
     
     @property
     def environment(self) -> Optional[Environment]:
@@ -228,6 +329,7 @@ class SupportSession:
     
     @environment.setter
     def environment(self, value) -> None:
+        self.version += 1
         if isinstance(value, str):
             self._environment = validate_environment(value)
         elif isinstance(value, Environment):
@@ -236,6 +338,7 @@ class SupportSession:
             self._environment = None
         else:
             raise ValidationError("Environment must be Environment enum or string")
+        self._mark_filled("environment", self._environment)
     
     @property
     def impact(self) -> Optional[ImpactLevel]:
@@ -243,6 +346,7 @@ class SupportSession:
     
     @impact.setter
     def impact(self, value) -> None:
+        self.version += 1
         if isinstance(value, str):
             self._impact = validate_impact(value)
         elif isinstance(value, ImpactLevel):
@@ -251,6 +355,7 @@ class SupportSession:
             self._impact = None
         else:
             raise ValidationError("Impact must be ImpactLevel enum or string")
+        self._mark_filled("impact", self._impact)
     
     def to_dict(self) -> dict:
         """Export session data for ticket creation."""
@@ -267,15 +372,45 @@ class SupportSession:
             "created_at": to_iso_date(self.created_at),
         }
 
-# Global session store (in production, use Redis or database)
-sessions: dict[int, SupportSession] = {}
+# Global session store (in production, use Redis or database),
+# least recently active first
+MAX_SESSIONS = 10_000
+sessions: OrderedDict[int, SupportSession] = OrderedDict()
+
+# Session of the request being handled, set by session_scope
+_current_session: ContextVar[Optional[SupportSession]] = ContextVar("current_session", default=None)
 
 def get_or_create_session(chat_id: int) -> SupportSession:
     """Get or create a session for a chat."""
-    if chat_id not in sessions:
-        sessions[chat_id] = SupportSession(chat_id=chat_id)
-    return sessions[chat_id]
+    session = _current_session.get()
+    if session is not None and session.chat_id == chat_id:
+        return session
+    
+    session = sessions.get(chat_id)
+    if session is None:
+        session = sessions[chat_id] = SupportSession(chat_id=chat_id)
+        while len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+    else:
+        sessions.move_to_end(chat_id)
+    return session
+
+@contextmanager
+def session_scope(chat_id: int) -> Iterator[SupportSession]:
+    """Pin the chat's session for the current request.
+    
+    Helpers called within the scope (agent functions, extraction) get the
+    pinned session back from get_or_create_session without a store lookup.
+    """
+    session = get_or_create_session(chat_id)
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
 
 def clear_session(chat_id: int) -> None:
     """Clear a session."""
-    sessions.pop(chat_id, None)
\ No newline at end of file
+    session = sessions.pop(chat_id, None)
+    if session is not None and _current_session.get() is session:
+        _current_session.set(None)
\ No newline at end of file
@@ -6,7 +6,7 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 from enum import Enum
 from utils.datetime_utils import to_iso_date
-from session import SupportSession, IssueCategory, Environment, ImpactLevel
+from session import SupportSession, IssueCategory, Environment, ImpactLevel, ALL_REQUIRED_MASK
 
 class Ticket:
     """Support ticket object."""
@@ -43,15 +43,7 @@ class Ticket:
 def create_ticket_from_session(session: SupportSession) -> Optional[Ticket]:
     """Create and persist a ticket from a session."""
     # Validate required fields
-    if not all([
-        session.user_name,
-        session.company_name,
-        session.issue_description,
-        session.issue_category,
-        session.software,
-        session.environment,
-        session.impact,
-    ]):
+    if session.filled_mask != ALL_REQUIRED_MASK or not session.issue_category:
         return None
     
     ticket = Ticket(session)